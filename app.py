@@ -1,23 +1,226 @@
 import streamlit as st
 import os
+import uuid
+import shutil
 from dotenv import load_dotenv
 import pandas as pd
 from src.model.model_run import UniqueIdentifier
 from src.connectors.redshift_connector import RedshiftConnector
+from src.connectors.snapshot_cache import SnapshotCache
+from src.model.jobs import MatchJob, job_signature
+from src.model.estimate import RunBudget
 
 # Load environment variables
 load_dotenv()
 
+# Matches shown in the results table; the full results are available as downloads
+DISPLAY_ROWS = 1000
+
+# Rows of the first table matched at a time, so only the second table is held whole
+DEFAULT_CHUNK_SIZE = 100_000
+
+# Exports are written under the app's static folder and downloaded straight from disk
+# (server.enableStaticServing in .streamlit/config.toml), so they are never held in memory
+EXPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "exports")
+EXPORT_FORMATS = {"CSV": "csv", "Parquet": "parquet"}
+# Largest file Streamlit serves from the static folder
+MAX_STATIC_FILE_BYTES = 200 * 1024 ** 2
+
+# Finished jobs kept per session for reuse, each holds its results and records
+MAX_FINISHED_JOBS = 3
+
+@st.cache_resource(show_spinner=False)
+def get_shared_connector(host, database, user, password, port):
+    """Pooled connector shared by every session using the same credentials"""
+    connector = RedshiftConnector()
+    connector.connect(host=host, database=database, user=user, password=password, port=port)
+    return connector
+
 def init_connection(credentials):
     """Initialize database connection"""
     try:
-        connector = RedshiftConnector()
-        connector.connect(**credentials)
-        return connector
+        return get_shared_connector(**credentials)
     except Exception as e:
         st.error(f"Connection Error: {str(e)}")
         return None
 
+@st.fragment(run_every=1.0)
+def show_job_progress(job):
+    """Live progress of a running job, refreshed every second without rerunning the page"""
+    if not job.running:
+        st.rerun()
+    
+    progress = job.progress
+    table1, table2 = job.artifacts['tables']
+    st.progress(
+        progress.fraction,
+        text=f"Matching {table1} with {table2} - {progress.stage}: "
+             f"{progress.pairs_scored:,} of {progress.pairs_total:,} candidate pairs scored"
+    )
+    if progress.cancelled:
+        st.caption("Cancelling...")
+    elif st.button("Cancel matching", key="cancel-job"):
+        job.cancel()
+
+def export_path(job, extension):
+    """File of the results of a job exported in one format, None until they are exported"""
+    if extension not in job.artifacts.get('exports', ()):
+        return None
+    return os.path.join(EXPORT_DIR, job.artifacts['export_id'], f"matching_results.{extension}")
+
+def export_results(job, extension):
+    """Stream the results of a job to a file of one format once (the first time it is asked for)"""
+    exports = job.artifacts.setdefault('exports', set())
+    if extension not in exports:
+        # A random directory name, since static files are served to every session
+        export_id = job.artifacts.setdefault('export_id', uuid.uuid4().hex)
+        export_dir = os.path.join(EXPORT_DIR, export_id)
+        os.makedirs(export_dir, exist_ok=True)
+        path = os.path.join(export_dir, f"matching_results.{extension}")
+        if extension == "csv":
+            job.result.to_csv(path)
+        else:
+            job.result.to_parquet(path)
+        exports.add(extension)
+
+def remember_job(jobs, signature, job):
+    """Keep a job as the most recent one and evict the oldest finished jobs beyond MAX_FINISHED_JOBS
+
+    Running jobs are never evicted. Files exported from evicted jobs are removed.
+    """
+    jobs.pop(signature, None)
+    jobs[signature] = job
+    finished = [key for key, kept in jobs.items() if not kept.running and key != signature]
+    for key in finished[:max(len(finished) - MAX_FINISHED_JOBS + 1, 0)]:
+        evicted = jobs.pop(key)
+        if 'export_id' in evicted.artifacts:
+            shutil.rmtree(os.path.join(EXPORT_DIR, evicted.artifacts['export_id']), ignore_errors=True)
+
+def show_estimate(estimate):
+    """Render the pre-run cost estimate of a pair of tables"""
+    est_col1, est_col2, est_col3, est_col4 = st.columns(4)
+    with est_col1:
+        st.metric("Estimated Candidate Pairs", f"{estimate.candidate_pairs:,}",
+                  help=f"Out of {estimate.cross_product_pairs:,} pairs of rows")
+    with est_col2:
+        st.metric("Estimated Run Time", f"{estimate.seconds:,.0f}s")
+    with est_col3:
+        st.metric("Estimated Memory", f"{estimate.memory_bytes / 1024 ** 2:,.0f} MB")
+    with est_col4:
+        st.metric("Estimated Matches", f"{estimate.matches:,}")
+    st.caption(
+        f"Extrapolated from samples of {estimate.sample_rows1:,} and {estimate.sample_rows2:,} rows "
+        f"of {estimate.rows1:,} and {estimate.rows2:,}"
+    )
+    for limit in estimate.over_budget:
+        st.warning(f"Over budget: {limit}")
+    for recommendation in estimate.recommendations:
+        st.info(recommendation)
+
+def show_results(job):
+    """Render the results of a completed job"""
+    results = job.result
+    unique_identifier = job.artifacts['identifier']
+    if results.empty:
+        st.info("No matches found between the selected tables.")
+        return
+    
+    st.success(f"Found {len(results)} potential matches!")
+    estimate = unique_identifier.last_estimate
+    if estimate is not None and not estimate.within_budget:
+        st.warning(f"The run was started over budget: {'; '.join(estimate.over_budget)}")
+    
+    # Create tabs for different views
+    tab1, tab2 = st.tabs(["Detailed Results", "Summary Statistics"])
+    
+    with tab1:
+        # Source columns are only joined for the displayed rows
+        st.dataframe(
+            results.head(DISPLAY_ROWS).style.background_gradient(
+                subset=['similarity_score'],
+                cmap='RdYlGn'
+            ),
+            use_container_width=True
+        )
+        if len(results) > DISPLAY_ROWS:
+            st.caption(f"Showing the first {DISPLAY_ROWS:,} of {len(results):,} matches")
+        
+        # Results are streamed to a file in chunks when asked for, then served from disk
+        download_col1, download_col2 = st.columns(2)
+        with download_col1:
+            file_format = st.radio("Export format", list(EXPORT_FORMATS), horizontal=True, key='export-format')
+            extension = EXPORT_FORMATS[file_format]
+            if export_path(job, extension) is None and st.button("📦 Export Results", key='export'):
+                with st.spinner(f"Writing {len(results):,} matches..."):
+                    export_results(job, extension)
+        with download_col2:
+            path = export_path(job, extension)
+            if path is not None and os.path.getsize(path) <= MAX_STATIC_FILE_BYTES:
+                url = f"app/static/exports/{job.artifacts['export_id']}/matching_results.{extension}"
+                st.markdown(
+                    f'<a href="{url}" download="matching_results.{extension}">📥 Download Results ({file_format})</a>',
+                    unsafe_allow_html=True
+                )
+            elif path is not None:
+                st.info(f"The export is too large to be downloaded from the app, it was written to {path}")
+    
+    with tab2:
+        metric_col1, metric_col2, metric_col3 = st.columns(3)
+        with metric_col1:
+            st.metric("Total Matches", len(results))
+        with metric_col2:
+            st.metric("Average Similarity", f"{results.scores.mean():.2f}%")
+        with metric_col3:
+            st.metric("Max Similarity", f"{results.scores.max():.2f}%")
+        
+        blocking_report = unique_identifier.last_blocking_report
+        if blocking_report is not None:
+            block_col1, block_col2 = st.columns(2)
+            with block_col1:
+                st.metric("Candidate Pairs Scored", f"{blocking_report.candidate_pairs:,}")
+            with block_col2:
+                st.metric("Blocking Reduction Ratio", f"{blocking_report.reduction_ratio:.2%}")
+        
+        scoring_counters = unique_identifier.last_scoring_counters
+        if scoring_counters is not None:
+            score_col1, score_col2, score_col3 = st.columns(3)
+            with score_col1:
+                st.metric("Comparisons Executed", f"{scoring_counters.comparisons_executed:,}")
+            with score_col2:
+                st.metric("Comparisons Pruned", f"{scoring_counters.comparisons_pruned:,}")
+            with score_col3:
+                st.metric("Comparisons Reused", f"{scoring_counters.comparisons_reused:,}",
+                          help="Repeated value pairs whose score was computed once")
+        
+        # Add a histogram of similarity scores
+        st.subheader("Similarity Score Distribution")
+        hist_data = pd.Series(results.scores)
+        st.bar_chart(hist_data.value_counts(bins=10).sort_index())
+
+        # Time and resources spent per stage of the run
+        stats = results.stats
+        if stats is not None:
+            st.subheader("Run Profile")
+            profile_col1, profile_col2, profile_col3, profile_col4 = st.columns(4)
+            with profile_col1:
+                st.metric("Run Time", f"{stats.wall_time:.2f}s")
+            with profile_col2:
+                st.metric("Rows Fetched", f"{stats.rows_fetched:,}",
+                          help=f"{stats.rows_from_cache:,} rows read from the snapshot cache")
+            with profile_col3:
+                st.metric("Data Fetched", f"{stats.bytes_fetched / 1024 ** 2:,.1f} MB")
+            with profile_col4:
+                peak_memory = stats.peak_memory_bytes
+                st.metric("Peak Memory", f"{peak_memory / 1024 ** 2:,.0f} MB" if peak_memory else "n/a",
+                          help="Peak resident memory of the app process during this run, scoring workers excluded")
+            st.dataframe(
+                stats.stage_table().rename(columns={
+                    'stage': 'Stage', 'wall_time': 'Wall Time (s)', 'cpu_time': 'CPU Time (s)', 'calls': 'Calls'
+                }),
+                hide_index=True,
+                use_container_width=True
+            )
+
 def main():
     st.set_page_config(page_title="Data Matching Tool", layout="wide")
     
@@ -46,6 +249,79 @@ def main():
             if connector:
                 st.session_state['connector'] = connector
                 st.success("Connected successfully!")
+        
+        if 'connector' in st.session_state:
+            if st.button("Refresh catalog"):
+                st.session_state['connector'].refresh_catalog()
+        
+        st.title("Matching Settings")
+        workers = st.number_input(
+            "Worker processes",
+            min_value=1,
+            max_value=os.cpu_count() or 1,
+            value=1,
+            help="Number of processes used to score candidate pairs"
+        )
+        chunk_size = st.number_input(
+            "Chunk size (rows)",
+            min_value=0,
+            value=DEFAULT_CHUNK_SIZE,
+            step=10_000,
+            help="The first table is streamed and matched this many rows at a time, which bounds "
+                 "memory; put the larger table first (0 to fetch it whole)"
+        )
+        text_matcher = st.selectbox(
+            "Name and address matching",
+            UniqueIdentifier.TEXT_MATCHERS,
+            format_func=lambda matcher: {'ratio': "Edit distance", 'tfidf': "Character n-gram TF-IDF"}[matcher],
+            help="TF-IDF finds nearest neighbours with sparse matrix products and copes "
+                 "better with reordered words and long addresses"
+        )
+        output_mode = st.selectbox(
+            "Matches per record",
+            ["All above threshold", "Best k per record", "One-to-one"],
+            help="Common names and shared email domains can produce many matches per record"
+        )
+        top_k = None
+        if output_mode == "Best k per record":
+            top_k = int(st.number_input("k", min_value=1, value=1))
+        one_to_one = output_mode == "One-to-one"
+        max_minutes = st.number_input(
+            "Time budget (minutes)",
+            min_value=0.0,
+            value=0.0,
+            help="Runs estimated to take longer are flagged before they start (0 for no limit)"
+        )
+        max_memory_gb = st.number_input(
+            "Memory budget (GB)",
+            min_value=0.0,
+            value=0.0,
+            help="Runs estimated to need more memory are flagged before they start (0 for no limit)"
+        )
+        refuse_over_budget = st.checkbox(
+            "Refuse runs over budget",
+            help="Otherwise they start with a warning"
+        )
+        budget = None
+        if max_minutes or max_memory_gb:
+            budget = RunBudget(
+                max_seconds=max_minutes * 60 if max_minutes else None,
+                max_memory_bytes=int(max_memory_gb * 1024 ** 3) if max_memory_gb else None,
+                refuse=refuse_over_budget
+            )
+        use_cache = st.checkbox(
+            "Cache table snapshots locally",
+            value=True,
+            help="Re-runs against unchanged tables skip the warehouse round trip"
+        )
+        if 'snapshot_cache' not in st.session_state:
+            st.session_state['snapshot_cache'] = SnapshotCache(
+                os.getenv('UNIQUE_CACHE_DIR', '.unique_cache'),
+                freshness='row_count'
+            )
+        if st.button("Clear cached snapshots"):
+            removed = st.session_state['snapshot_cache'].clear()
+            st.success(f"Removed {removed} cached snapshots")
 
     # Main content
     st.title("Unique - Data Matching Tool")
@@ -93,64 +369,74 @@ def main():
         if schema1 and table1 and columns1 and schema2 and table2 and columns2:
             col1, col2, col3 = st.columns([1, 2, 1])
             with col2:
+                estimate_button = st.button("📏 Estimate Cost", use_container_width=True)
                 run_button = st.button("🔍 Run Matching Analysis", use_container_width=True)
-                
-                if run_button:
-                    with st.spinner("Analyzing tables for matching users..."):
-                        try:
-                            unique_identifier = UniqueIdentifier(connector)
-                            results = unique_identifier.find_unique_users(
-                                schema1=schema1,
-                                table1=table1,
-                                columns1=columns1,
-                                schema2=schema2,
-                                table2=table2,
-                                columns2=columns2
-                            )
-                            
-                            if not results.empty:
-                                st.success(f"Found {len(results)} potential matches!")
-                                
-                                # Create tabs for different views
-                                tab1, tab2 = st.tabs(["Detailed Results", "Summary Statistics"])
-                                
-                                with tab1:
-                                    st.dataframe(
-                                        results.style.background_gradient(
-                                            subset=['similarity_score'],
-                                            cmap='RdYlGn'
-                                        ),
-                                        use_container_width=True
-                                    )
-                                    
-                                    # Download button
-                                    csv = results.to_csv(index=False)
-                                    st.download_button(
-                                        "📥 Download Results",
-                                        csv,
-                                        "matching_results.csv",
-                                        "text/csv",
-                                        key='download-csv'
-                                    )
-                                
-                                with tab2:
-                                    metric_col1, metric_col2, metric_col3 = st.columns(3)
-                                    with metric_col1:
-                                        st.metric("Total Matches", len(results))
-                                    with metric_col2:
-                                        st.metric("Average Similarity", f"{results['similarity_score'].mean():.2f}%")
-                                    with metric_col3:
-                                        st.metric("Max Similarity", f"{results['similarity_score'].max():.2f}%")
-                                    
-                                    # Add a histogram of similarity scores
-                                    st.subheader("Similarity Score Distribution")
-                                    hist_data = results['similarity_score']
-                                    st.bar_chart(hist_data.value_counts(bins=10).sort_index())
-                            else:
-                                st.info("No matches found between the selected tables.")
-                                
-                        except Exception as e:
-                            st.error(f"Error during matching: {str(e)}")
+            
+            if estimate_button:
+                try:
+                    with st.spinner("Sampling both tables..."):
+                        estimate = UniqueIdentifier(connector, text_matcher=text_matcher).estimate_run(
+                            schema1, table1, columns1, schema2, table2, columns2,
+                            workers=int(workers), chunk_size=int(chunk_size) or None, budget=budget
+                        )
+                    show_estimate(estimate)
+                except Exception as e:
+                    st.error(f"Error during estimation: {str(e)}")
+            
+            if run_button:
+                try:
+                    # The data snapshot is part of the signature, so changed tables are matched again
+                    snapshot = {
+                        f"{schema}.{table}": connector.get_freshness_marker(schema, table)
+                        for schema, table in [(schema1, table1), (schema2, table2)]
+                    }
+                    signature = job_signature(
+                        host=connector.host, database=connector.database,
+                        schema1=schema1, table1=table1, columns1=columns1,
+                        schema2=schema2, table2=table2, columns2=columns2,
+                        threshold=UniqueIdentifier.SIMILARITY_THRESHOLD, text_matcher=text_matcher,
+                        top_k=top_k, one_to_one=one_to_one, budget=budget, snapshot=snapshot
+                    )
+                    jobs = st.session_state.setdefault('match_jobs', {})
+                    job = jobs.get(signature)
+                    # Completed runs are reused; failed or cancelled ones are started again
+                    if job is None or job.status in ('failed', 'cancelled'):
+                        unique_identifier = UniqueIdentifier(
+                            connector,
+                            snapshot_cache=st.session_state['snapshot_cache'] if use_cache else None,
+                            text_matcher=text_matcher
+                        )
+                        job = MatchJob(
+                            unique_identifier.find_unique_users,
+                            schema1=schema1,
+                            table1=table1,
+                            columns1=columns1,
+                            schema2=schema2,
+                            table2=table2,
+                            columns2=columns2,
+                            workers=int(workers),
+                            chunk_size=int(chunk_size) or None,
+                            top_k=top_k,
+                            one_to_one=one_to_one,
+                            budget=budget
+                        )
+                        job.artifacts['identifier'] = unique_identifier
+                        job.artifacts['tables'] = (f"{schema1}.{table1}", f"{schema2}.{table2}")
+                    remember_job(jobs, signature, job)
+                    st.session_state['current_job'] = signature
+                except Exception as e:
+                    st.error(f"Error during matching: {str(e)}")
+        
+        job = st.session_state.get('match_jobs', {}).get(st.session_state.get('current_job'))
+        if job is not None:
+            if job.running:
+                show_job_progress(job)
+            elif job.status == 'failed':
+                st.error(f"Error during matching: {job.error}")
+            elif job.status == 'cancelled':
+                st.warning("Matching was cancelled.")
+            else:
+                show_results(job)
     else:
         st.info("👈 Please connect to your database using the sidebar")
 
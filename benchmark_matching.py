@@ -0,0 +1,226 @@
+import os
+import json
+import random
+import platform
+import argparse
+import subprocess
+import multiprocessing
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from rapidfuzz import fuzz as rapid_fuzz
+from thefuzz import fuzz
+from test_matching import fake, create_matching_record, generate_phone
+from src.model.model_run import UniqueIdentifier
+from src.model.scoring import ColumnPair, ComparisonPlan, score_candidates
+from src.connectors.memory_connector import InMemoryConnector
+
+
+### Offline benchmark of the matching pipeline on synthetic data, no database needed
+### Usage: python benchmark_matching.py --sizes 1000 10000 --output results.json [--baseline previous.json]
+###        python benchmark_matching.py --check-scores  (vectorized scores against thefuzz, no timing)
+
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+COLUMNS1 = ["email", "full_name", "phone"]
+COLUMNS2 = ["user_email", "name", "contact_number"]
+
+def generate_tables(num_records, match_percentage=0.7, seed=0):
+    """Generate both tables like populate_test_data; row i of each table is the same person for i < num_matching"""
+    random.seed(seed)
+    fake.seed_instance(seed)
+    num_matching = int(num_records * match_percentage)
+
+    matching_records = [create_matching_record() for _ in range(num_matching)]
+    customers = [record['original'] for record in matching_records]
+    users = [record['variations'] for record in matching_records]
+    for _ in range(num_records - num_matching):
+        customers.append((fake.email(), fake.name(), generate_phone()))
+        users.append((fake.email(), fake.name(), generate_phone()))
+
+    return (
+        pd.DataFrame(customers, columns=COLUMNS1),
+        pd.DataFrame(users, columns=COLUMNS2),
+        num_matching
+    )
+
+def load_tables(num_records, seed, data_dir):
+    """Generated tables are kept in data_dir, Faker is slow at a million rows"""
+    path1 = os.path.join(data_dir, f"customers_{num_records}_{seed}.parquet")
+    path2 = os.path.join(data_dir, f"users_{num_records}_{seed}.parquet")
+    if os.path.exists(path1) and os.path.exists(path2):
+        return pd.read_parquet(path1), pd.read_parquet(path2), int(num_records * 0.7)
+
+    customers, users, num_matching = generate_tables(num_records, seed=seed)
+    os.makedirs(data_dir, exist_ok=True)
+    customers.to_parquet(path1, index=False)
+    users.to_parquet(path2, index=False)
+    return customers, users, num_matching
+
+def prepare_tables(num_records, seed, data_dir):
+    """Generate a dataset ahead of its run, so generation does not count in the run's peak RSS"""
+    load_tables(num_records, seed, data_dir)
+
+def run_benchmark(num_records, seed=0, workers=1, data_dir='.benchmark_data', text_matcher='ratio'):
+    """Run the matching pipeline on one dataset size and return its measurements"""
+    customers, users, num_matching = load_tables(num_records, seed, data_dir)
+    connector = InMemoryConnector({'bench': {'customers': customers, 'users': users}})
+    identifier = UniqueIdentifier(connector, text_matcher=text_matcher)
+
+    matches = identifier.find_unique_users('bench', 'customers', COLUMNS1, 'bench', 'users', COLUMNS2,
+                                           workers=workers)
+    stats = matches.stats
+    scoring_seconds = stats.stages['scoring'].wall_time if 'scoring' in stats.stages else 0.0
+
+    # Row i of both tables is the same person for i < num_matching
+    true_positives = int(((matches.table1_id == matches.table2_id) & (matches.table1_id < num_matching)).sum())
+    return {
+        'rows': num_records,
+        'workers': workers,
+        'text_matcher': text_matcher,
+        'candidate_pairs': stats.candidate_pairs,
+        'reduction_ratio': 1 - stats.candidate_pairs / stats.total_pairs if stats.total_pairs else 0.0,
+        'comparisons_executed': stats.comparisons_executed,
+        'comparisons_pruned': stats.comparisons_pruned,
+        'comparisons_reused': stats.comparisons_reused,
+        'matches': len(matches),
+        'stage_seconds': {name: stage.wall_time for name, stage in stats.stages.items()},
+        'stage_cpu_seconds': {name: stage.cpu_time for name, stage in stats.stages.items()},
+        'total_seconds': stats.wall_time,
+        'candidate_pairs_per_sec': stats.candidate_pairs / scoring_seconds if scoring_seconds else None,
+        'cross_product_pairs_per_sec': num_records * num_records / stats.wall_time if stats.wall_time else None,
+        'precision': true_positives / len(matches) if len(matches) else None,
+        'recall': true_positives / num_matching if num_matching else None,
+        'peak_rss_mb': stats.peak_memory_bytes / 1024 ** 2 if stats.peak_memory_bytes else None
+    }
+
+def check_scores(num_pairs=200_000, seed=0):
+    """Compare the vectorized scorer with thefuzz on random near-duplicate strings
+
+    Raw ratios in [threshold - 0.5, threshold) round up to the threshold in thefuzz,
+    and so must be accepted by the vectorized path (and not pruned by length bounds).
+    Returns the number of pairs whose acceptance or score differs.
+    """
+    threshold = UniqueIdentifier.SIMILARITY_THRESHOLD
+    rng = random.Random(seed)
+    alphabet = 'abcdefghij'
+    values1, values2 = [], []
+    for _ in range(num_pairs):
+        value = ''.join(rng.choice(alphabet) for _ in range(rng.randint(5, 24)))
+        edited = list(value)
+        for _ in range(rng.randint(0, 3)):
+            position = rng.randrange(len(edited) + 1)
+            operation = rng.choice(['insert', 'delete', 'replace'])
+            if operation == 'insert':
+                edited.insert(position, rng.choice(alphabet))
+            elif edited and position < len(edited):
+                if operation == 'delete':
+                    del edited[position]
+                else:
+                    edited[position] = rng.choice(alphabet)
+        values1.append(value)
+        # Padding makes length differences close to the threshold, where length bounds prune
+        padding = ''.join(rng.choice(alphabet) for _ in range(rng.choice([0, 0, rng.randint(1, 5)])))
+        values2.append(''.join(edited) + padding or value)
+
+    values1, values2 = np.array(values1, dtype=object), np.array(values2, dtype=object)
+    plan = ComparisonPlan.compile([ColumnPair('document', 'document', 1.0)], {'document': values2})
+    positions = np.arange(num_pairs, dtype=np.int64)
+    left, right, scores, _ = score_candidates({'document': values1}, {'document': values2},
+                                              positions, positions, plan, threshold)
+    vectorized = dict(zip(left.tolist(), scores.tolist()))
+
+    mismatches, band = 0, 0
+    for position, (value1, value2) in enumerate(zip(values1, values2)):
+        expected = fuzz.ratio(value1, value2)
+        band += threshold - 0.5 <= rapid_fuzz.ratio(value1, value2) < threshold
+        if vectorized.get(position) != (expected if expected >= threshold else None):
+            mismatches += 1
+    print(f"{num_pairs:,} pairs checked against thefuzz ({band:,} with a raw ratio in "
+          f"[{threshold - 0.5}, {threshold})), {mismatches:,} mismatches")
+    return mismatches
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def formatted(value, spec: str, unit: str = '') -> str:
+    """Format a metric, 'n/a' when it could not be measured (None)"""
+    return 'n/a' if value is None else format(value, spec) + unit
+
+def change(after, before, spec: str, unit: str = '') -> str:
+    """Signed change of a metric, 'n/a' when either run could not measure it"""
+    return 'n/a' if after is None or before is None else format(after - before, spec) + unit
+
+def compare(results, baseline):
+    """Print the change of every size against a previous results file"""
+    previous = {run['rows']: run for run in baseline['runs']}
+    print(f"\nCompared to {baseline.get('commit') or 'baseline'}:")
+    for run in results['runs']:
+        before = previous.get(run['rows'])
+        if before is None:
+            continue
+        speedup = before['total_seconds'] / run['total_seconds'] if run['total_seconds'] else float('nan')
+        print(f"  {run['rows']:>9,} rows: {speedup:.2f}x total time, "
+              f"peak RSS {change(run['peak_rss_mb'], before['peak_rss_mb'], '+.0f', ' MB')}, "
+              f"recall {change(run['recall'], before['recall'], '+.4f')}")
+
+def main():
+    """Main benchmark function"""
+    parser = argparse.ArgumentParser(description="Benchmark the matching pipeline on synthetic data")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="rows per table")
+    parser.add_argument('--workers', type=int, default=1, help="scoring worker processes")
+    parser.add_argument('--text-matcher', choices=UniqueIdentifier.TEXT_MATCHERS, default='ratio',
+                        help="how name and address columns are compared")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default='.benchmark_data', help="where generated datasets are kept")
+    parser.add_argument('--output', default='benchmark_results.json', help="JSON results file")
+    parser.add_argument('--baseline', help="previous results file to compare against")
+    parser.add_argument('--check-scores', action='store_true',
+                        help="only check the vectorized scores against thefuzz and exit")
+    args = parser.parse_args()
+
+    if args.check_scores:
+        raise SystemExit(1 if check_scores(seed=args.seed) else 0)
+
+    results = {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'runs': []
+    }
+
+    for size in args.sizes:
+        print(f"Benchmarking {size:,} rows per table...")
+        # Fresh processes per size so peak RSS is measured per run
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            executor.submit(prepare_tables, size, args.seed, args.data_dir).result()
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            run = executor.submit(run_benchmark, size, args.seed, args.workers, args.data_dir,
+                                  args.text_matcher).result()
+        results['runs'].append(run)
+        print(f"  {run['candidate_pairs']:,} candidate pairs ({run['reduction_ratio']:.4%} skipped), "
+              f"{run['matches']:,} matches in {run['total_seconds']:.2f}s")
+        print("  stages: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in run['stage_seconds'].items()))
+        print(f"  {formatted(run['candidate_pairs_per_sec'], ',.0f')} candidate pairs/s, "
+              f"peak RSS {formatted(run['peak_rss_mb'], '.0f', ' MB')}, "
+              f"precision {formatted(run['precision'], '.4f')}, recall {formatted(run['recall'], '.4f')}")
+
+    with open(args.output, 'w') as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            compare(results, json.load(baseline_file))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import re
+import operator
+import pandas as pd
+from abc import ABC, abstractmethod
+from typing import Any, Callable, List, Dict, Optional, Iterator, Tuple
+
+# Operators of the WHERE clauses understood by sources without a SQL engine
+COMPARISONS = {
+    '=': operator.eq, '<>': operator.ne, '!=': operator.ne,
+    '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge
+}
+
+_COMPARISON = re.compile(r'^\s*"?(\w+)"?\s*(<=|>=|<>|!=|=|<|>)\s*%s\s*$')
+
+
+def simple_conditions(where: str, params: Optional[tuple]
+                      ) -> List[Tuple[str, Callable[[Any, Any], Any], Any]]:
+    """Split a WHERE clause of "column <op> %s" comparisons joined by AND into (column, operator, value)
+
+    Sources without a SQL engine (files, DataFrames) apply these themselves, e.g.
+    the watermark filter of incremental runs. Other clauses raise a ValueError.
+    """
+    parts = re.split(r'\s+AND\s+', where.strip(), flags=re.IGNORECASE)
+    params = tuple(params or ())
+    matches = [_COMPARISON.match(part) for part in parts]
+    if not all(matches) or len(params) != len(parts):
+        raise ValueError(f"Only comparisons of a column with a parameter joined by AND are supported: {where}")
+    return [(match.group(1), COMPARISONS[match.group(2)], value) for match, value in zip(matches, params)]
+
+
+class BaseConnector(ABC):
+    """Interface the matcher uses to read tables, whatever the data source
+
+    Tables are addressed as schema + table. WHERE clauses passed to
+    fetch_table_chunks use %s placeholders bound to params; sources without a
+    SQL engine support the clauses of simple_conditions.
+    """
+    # Whether exact matches can be joined in the source (find_exact_matches and
+    # exact_match_residual_filter, implemented by the connectors supporting it)
+    supports_pushdown = False
+
+    def __init__(self):
+        # Identify the source in snapshot cache keys
+        self.host = None
+        self.database = None
+
+    @abstractmethod
+    def get_schemas(self) -> List[str]:
+        """Get list of all schemas"""
+
+    @abstractmethod
+    def get_tables(self, schema: str) -> List[str]:
+        """Get list of all tables in the specified schema"""
+
+    @abstractmethod
+    def get_columns(self, schema: str, table_name: str) -> List[Dict[str, str]]:
+        """Get name and type of every column of a table"""
+
+    @abstractmethod
+    def fetch_table_chunks(self, schema: str, table_name: str, columns: List[str],
+                           batch_size: Optional[int] = None, where: Optional[str] = None,
+                           params: Optional[tuple] = None) -> Iterator[pd.DataFrame]:
+        """Stream the selected columns of a table as DataFrames of at most batch_size rows"""
+
+    @abstractmethod
+    def get_freshness_marker(self, schema: str, table_name: str,
+                             updated_at_column: Optional[str] = None) -> str:
+        """Cheap marker that changes when the table changes"""
+
+    def fetch_table(self, schema: str, table_name: str, columns: List[str],
+                    batch_size: Optional[int] = None, where: Optional[str] = None,
+                    params: Optional[tuple] = None) -> pd.DataFrame:
+        """Fetch the selected columns of a whole table, building the DataFrame batch by batch"""
+        chunks = list(self.fetch_table_chunks(schema, table_name, columns, batch_size, where, params))
+        if not chunks:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(chunks, ignore_index=True)
+
+    def count_rows(self, schema: str, table_name: str) -> int:
+        """Number of rows of a table; sources that can count without reading rows override this"""
+        first_column = self.get_columns(schema, table_name)[0]['name']
+        return sum(len(chunk) for chunk in self.fetch_table_chunks(schema, table_name, [first_column]))
+
+    def sample_rows(self, schema: str, table_name: str, columns: List[str], size: int) -> pd.DataFrame:
+        """About size rows of a table, used to estimate the cost of a run
+
+        Defaults to the first rows (like LIMIT); sources able to draw a random sample
+        override this.
+        """
+        chunk = next(iter(self.fetch_table_chunks(schema, table_name, columns, size)), None)
+        return chunk.iloc[:size].reset_index(drop=True) if chunk is not None else pd.DataFrame(columns=columns)
+
+    def refresh_catalog(self, schema: Optional[str] = None):
+        """Drop cached catalog information, if any"""
+
+    def close(self):
+        """Release the resources held by the connector"""
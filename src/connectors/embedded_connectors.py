@@ -0,0 +1,225 @@
+import os
+import sqlite3
+import pandas as pd
+import pyarrow as pa
+from typing import List, Dict, Optional, Iterator
+from src.connectors.base_connector import BaseConnector
+
+def _column_array(values: tuple) -> pa.Array:
+    """Arrow array of a SQLite column; columns mixing types (allowed by SQLite) become text"""
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array([None if value is None else str(value) for value in values], type=pa.string())
+
+
+class SQLiteConnector(BaseConnector):
+    """Connector reading tables from a SQLite database file
+
+    Schemas are the attached databases ('main' for the file itself). A connection
+    is opened per query, so tables can be fetched from several threads. sqlite3 only
+    returns rows, which are converted to Arrow-backed columns batch by batch.
+    """
+    # Rows fetched per round trip when streaming tables
+    DEFAULT_BATCH_SIZE = 50_000
+
+    def __init__(self, path: str):
+        super().__init__()
+        if not os.path.exists(path):
+            raise ConnectionError(f"SQLite database not found: {path}")
+        self.path = path
+        self.host = 'sqlite'
+        self.database = os.path.abspath(path)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path)
+
+    def get_schemas(self) -> List[str]:
+        connection = self._connect()
+        try:
+            return [row[1] for row in connection.execute("PRAGMA database_list")]
+        finally:
+            connection.close()
+
+    def get_tables(self, schema: str) -> List[str]:
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                f"SELECT name FROM {schema}.sqlite_master WHERE type IN ('table', 'view') "
+                "AND name NOT LIKE 'sqlite_%' ORDER BY name"
+            )
+            return [row[0] for row in rows]
+        finally:
+            connection.close()
+
+    def get_columns(self, schema: str, table_name: str) -> List[Dict[str, str]]:
+        connection = self._connect()
+        try:
+            rows = connection.execute(f"PRAGMA {schema}.table_info('{table_name}')")
+            return [{"name": row[1], "type": row[2].lower() or 'text'} for row in rows]
+        finally:
+            connection.close()
+
+    def fetch_table_chunks(self, schema: str, table_name: str, columns: List[str],
+                           batch_size: Optional[int] = None, where: Optional[str] = None,
+                           params: Optional[tuple] = None) -> Iterator[pd.DataFrame]:
+        """Stream the selected columns of a table as DataFrames of at most batch_size rows"""
+        batch_size = batch_size or self.DEFAULT_BATCH_SIZE
+        query = f"SELECT {', '.join(columns)} FROM {schema}.{table_name}"
+        if where:
+            query += f" WHERE {where.replace('%s', '?')}"
+
+        connection = self._connect()
+        try:
+            cursor = connection.execute(query, params or ())
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                table = pa.Table.from_arrays(
+                    [_column_array(values) for values in zip(*rows)], names=columns
+                )
+                yield table.to_pandas(types_mapper=pd.ArrowDtype)
+        finally:
+            connection.close()
+
+    def count_rows(self, schema: str, table_name: str) -> int:
+        connection = self._connect()
+        try:
+            return connection.execute(f"SELECT COUNT(*) FROM {schema}.{table_name}").fetchone()[0]
+        finally:
+            connection.close()
+
+    def sample_rows(self, schema: str, table_name: str, columns: List[str], size: int) -> pd.DataFrame:
+        """Random sample of about size rows (ORDER BY RANDOM() LIMIT, SQLite has no TABLESAMPLE)"""
+        query = f"SELECT {', '.join(columns)} FROM {schema}.{table_name} ORDER BY RANDOM() LIMIT ?"
+        connection = self._connect()
+        try:
+            rows = connection.execute(query, (size,)).fetchall()
+        finally:
+            connection.close()
+        if not rows:
+            return pd.DataFrame(columns=columns)
+        table = pa.Table.from_arrays([_column_array(values) for values in zip(*rows)], names=columns)
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+    def get_freshness_marker(self, schema: str, table_name: str,
+                             updated_at_column: Optional[str] = None) -> str:
+        """Row count (and optional MAX(updated_at)) joined as a string"""
+        query = f"SELECT COUNT(*) FROM {schema}.{table_name}"
+        if updated_at_column:
+            query = f"SELECT COUNT(*), MAX({updated_at_column}) FROM {schema}.{table_name}"
+
+        connection = self._connect()
+        try:
+            return "|".join(str(value) for value in connection.execute(query).fetchone())
+        finally:
+            connection.close()
+
+
+class DuckDBConnector(BaseConnector):
+    """Connector reading tables from a DuckDB database
+
+    Query results are streamed as Arrow record batches, so columns reach the matcher
+    without building Python rows. Requires the optional duckdb package.
+    """
+    # Rows fetched per record batch when streaming tables
+    DEFAULT_BATCH_SIZE = 50_000
+
+    def __init__(self, path: str = ':memory:', read_only: bool = True):
+        super().__init__()
+        try:
+            import duckdb
+        except ImportError:
+            raise ImportError("DuckDBConnector requires the duckdb package (pip install duckdb)")
+        self.connection = duckdb.connect(path, read_only=read_only and path != ':memory:')
+        self.host = 'duckdb'
+        self.database = path if path == ':memory:' else os.path.abspath(path)
+
+    def _cursor(self):
+        """Own connection to the same database, safe to use from another thread"""
+        return self.connection.cursor()
+
+    def get_schemas(self) -> List[str]:
+        cursor = self._cursor()
+        try:
+            rows = cursor.execute(
+                "SELECT DISTINCT table_schema FROM information_schema.tables ORDER BY table_schema"
+            ).fetchall()
+            return [row[0] for row in rows]
+        finally:
+            cursor.close()
+
+    def get_tables(self, schema: str) -> List[str]:
+        cursor = self._cursor()
+        try:
+            rows = cursor.execute(
+                "SELECT table_name FROM information_schema.tables WHERE table_schema = ? ORDER BY table_name",
+                [schema]
+            ).fetchall()
+            return [row[0] for row in rows]
+        finally:
+            cursor.close()
+
+    def get_columns(self, schema: str, table_name: str) -> List[Dict[str, str]]:
+        cursor = self._cursor()
+        try:
+            rows = cursor.execute(
+                "SELECT column_name, data_type FROM information_schema.columns "
+                "WHERE table_schema = ? AND table_name = ? ORDER BY ordinal_position",
+                [schema, table_name]
+            ).fetchall()
+            return [{"name": row[0], "type": row[1].lower()} for row in rows]
+        finally:
+            cursor.close()
+
+    def fetch_table_chunks(self, schema: str, table_name: str, columns: List[str],
+                           batch_size: Optional[int] = None, where: Optional[str] = None,
+                           params: Optional[tuple] = None) -> Iterator[pd.DataFrame]:
+        """Stream the selected columns as DataFrames of Arrow-backed columns, at most batch_size rows each"""
+        batch_size = batch_size or self.DEFAULT_BATCH_SIZE
+        query = f"SELECT {', '.join(columns)} FROM {schema}.{table_name}"
+        if where:
+            query += f" WHERE {where.replace('%s', '?')}"
+
+        cursor = self._cursor()
+        try:
+            reader = cursor.execute(query, list(params or ())).fetch_record_batch(batch_size)
+            for batch in reader:
+                if batch.num_rows:
+                    yield batch.to_pandas(types_mapper=pd.ArrowDtype)
+        finally:
+            cursor.close()
+
+    def count_rows(self, schema: str, table_name: str) -> int:
+        cursor = self._cursor()
+        try:
+            return cursor.execute(f"SELECT COUNT(*) FROM {schema}.{table_name}").fetchone()[0]
+        finally:
+            cursor.close()
+
+    def sample_rows(self, schema: str, table_name: str, columns: List[str], size: int) -> pd.DataFrame:
+        """Reservoir sample of about size rows (USING SAMPLE, repeatable seed)"""
+        query = (f"SELECT {', '.join(columns)} FROM {schema}.{table_name} "
+                 f"USING SAMPLE reservoir({int(size)} ROWS) REPEATABLE (0)")
+        cursor = self._cursor()
+        try:
+            return cursor.execute(query).fetch_arrow_table().to_pandas(types_mapper=pd.ArrowDtype)
+        finally:
+            cursor.close()
+
+    def get_freshness_marker(self, schema: str, table_name: str,
+                             updated_at_column: Optional[str] = None) -> str:
+        """Row count (and optional MAX(updated_at)) joined as a string"""
+        query = f"SELECT COUNT(*) FROM {schema}.{table_name}"
+        if updated_at_column:
+            query = f"SELECT COUNT(*), MAX({updated_at_column}) FROM {schema}.{table_name}"
+
+        cursor = self._cursor()
+        try:
+            return "|".join(str(value) for value in cursor.execute(query).fetchone())
+        finally:
+            cursor.close()
+
+    def close(self):
+        self.connection.close()
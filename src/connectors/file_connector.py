@@ -0,0 +1,147 @@
+import os
+import zlib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.dataset as ds
+from typing import List, Dict, Optional, Iterator
+from src.connectors.base_connector import BaseConnector, simple_conditions
+
+def arrow_type_name(arrow_type: pa.DataType) -> str:
+    """Name of an Arrow type in the same vocabulary as the warehouse catalog"""
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return 'character varying'
+    if pa.types.is_integer(arrow_type):
+        return 'bigint'
+    if pa.types.is_floating(arrow_type) or pa.types.is_decimal(arrow_type):
+        return 'double precision'
+    if pa.types.is_boolean(arrow_type):
+        return 'boolean'
+    if pa.types.is_timestamp(arrow_type):
+        return 'timestamp without time zone'
+    if pa.types.is_date(arrow_type):
+        return 'date'
+    return str(arrow_type)
+
+
+def arrow_schema(df: pd.DataFrame) -> pa.Schema:
+    """Arrow schema of a frame written in chunks; columns that are all null in it are assumed to be text"""
+    return pa.schema([
+        field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+        for field in pa.Schema.from_pandas(df, preserve_index=False)
+    ])
+
+
+class FileConnector(BaseConnector):
+    """Connector reading Parquet and CSV exports from a local directory
+
+    Every .parquet / .csv file is a table named after the file. Files directly in
+    root_dir belong to the 'default' schema, files in a subdirectory to the schema
+    named after it. Batches are read with Arrow and handed over as Arrow-backed
+    columns, without building Python rows. CSV columns are all read as text.
+    Filters (where) are pushed into the Arrow scan and limited to the comparisons
+    of simple_conditions.
+    """
+    # Rows per chunk when streaming tables
+    DEFAULT_BATCH_SIZE = 50_000
+
+    DEFAULT_SCHEMA = 'default'
+
+    FORMATS = {'.parquet': 'parquet', '.csv': 'csv'}
+
+    def __init__(self, root_dir: str):
+        super().__init__()
+        if not os.path.isdir(root_dir):
+            raise ConnectionError(f"Directory not found: {root_dir}")
+        self.root_dir = root_dir
+        self.host = 'file'
+        self.database = os.path.abspath(root_dir)
+
+    def _schema_dir(self, schema: str) -> str:
+        return self.root_dir if schema == self.DEFAULT_SCHEMA else os.path.join(self.root_dir, schema)
+
+    def _table_files(self, schema: str) -> Dict[str, str]:
+        """Table name -> file path for the data files of a schema"""
+        directory = self._schema_dir(schema)
+        if not os.path.isdir(directory):
+            return {}
+        files = {}
+        for name in sorted(os.listdir(directory)):
+            table, extension = os.path.splitext(name)
+            if extension.lower() in self.FORMATS and os.path.isfile(os.path.join(directory, name)):
+                files.setdefault(table, os.path.join(directory, name))
+        return files
+
+    def _dataset(self, schema: str, table_name: str) -> ds.Dataset:
+        path = self._table_files(schema).get(table_name)
+        if path is None:
+            raise ValueError(f"Table {schema}.{table_name} not found in {self.root_dir}")
+
+        file_format = self.FORMATS[os.path.splitext(path)[1].lower()]
+        if file_format == 'parquet':
+            return ds.dataset(path, format='parquet')
+
+        # Read every CSV column as text so identifiers keep their leading zeros
+        header = ds.dataset(path, format='csv').schema.names
+        csv_format = ds.CsvFileFormat(convert_options=pa_csv.ConvertOptions(
+            column_types={column: pa.string() for column in header},
+            strings_can_be_null=True
+        ))
+        return ds.dataset(path, format=csv_format)
+
+    def get_schemas(self) -> List[str]:
+        schemas = [self.DEFAULT_SCHEMA] if self._table_files(self.DEFAULT_SCHEMA) else []
+        for name in sorted(os.listdir(self.root_dir)):
+            if os.path.isdir(os.path.join(self.root_dir, name)) and self._table_files(name):
+                schemas.append(name)
+        return schemas
+
+    def get_tables(self, schema: str) -> List[str]:
+        return list(self._table_files(schema))
+
+    def get_columns(self, schema: str, table_name: str) -> List[Dict[str, str]]:
+        if table_name not in self._table_files(schema):
+            return []
+        return [
+            {"name": field.name, "type": arrow_type_name(field.type)}
+            for field in self._dataset(schema, table_name).schema
+        ]
+
+    def fetch_table_chunks(self, schema: str, table_name: str, columns: List[str],
+                           batch_size: Optional[int] = None, where: Optional[str] = None,
+                           params: Optional[tuple] = None) -> Iterator[pd.DataFrame]:
+        """Stream the selected columns as DataFrames of Arrow-backed columns, at most batch_size rows each"""
+        dataset = self._dataset(schema, table_name)
+        expression = None
+        for column, compare, value in simple_conditions(where, params) if where else []:
+            # Parameters are cast to the column type, e.g. a watermark persisted as text
+            condition = compare(ds.field(column), pa.scalar(value).cast(dataset.schema.field(column).type))
+            expression = condition if expression is None else expression & condition
+
+        batch_size = batch_size or self.DEFAULT_BATCH_SIZE
+        scanner = dataset.scanner(columns=columns, filter=expression, batch_size=batch_size)
+        for batch in scanner.to_batches():
+            if batch.num_rows:
+                yield batch.to_pandas(types_mapper=pd.ArrowDtype)
+
+    def count_rows(self, schema: str, table_name: str) -> int:
+        """Row count, from the Parquet metadata when available"""
+        return self._dataset(schema, table_name).count_rows()
+
+    def sample_rows(self, schema: str, table_name: str, columns: List[str], size: int) -> pd.DataFrame:
+        """Random sample of about size rows (seeded per table, so estimates are repeatable)"""
+        dataset = self._dataset(schema, table_name)
+        rows = dataset.count_rows()
+        rng = np.random.default_rng(zlib.crc32(f"{schema}.{table_name}".encode()))
+        positions = np.sort(rng.choice(rows, min(size, rows), replace=False))
+        return dataset.take(positions, columns=columns).to_pandas(types_mapper=pd.ArrowDtype)
+
+    def get_freshness_marker(self, schema: str, table_name: str,
+                             updated_at_column: Optional[str] = None) -> str:
+        """Size and modification time of the file, which change whenever it is rewritten"""
+        path = self._table_files(schema).get(table_name)
+        if path is None:
+            raise ValueError(f"Table {schema}.{table_name} not found in {self.root_dir}")
+        stat = os.stat(path)
+        return f"{stat.st_size}|{stat.st_mtime_ns}"
@@ -0,0 +1,93 @@
+import zlib
+import pandas as pd
+from typing import List, Dict, Optional, Iterator
+from src.connectors.base_connector import BaseConnector, simple_conditions
+
+class InMemoryConnector(BaseConnector):
+    """Connector serving DataFrames held in memory, for benchmarks and offline runs
+
+    Tables are registered as {schema: {table: DataFrame}}. Filters (where) are
+    applied as a boolean mask and limited to the comparisons of simple_conditions.
+    """
+    # Rows per chunk when streaming tables
+    DEFAULT_BATCH_SIZE = 50_000
+
+    # Column types reported for each pandas dtype kind
+    TYPE_NAMES = {
+        'i': 'bigint', 'u': 'bigint', 'f': 'double precision', 'b': 'boolean',
+        'M': 'timestamp without time zone'
+    }
+
+    def __init__(self, tables: Optional[Dict[str, Dict[str, pd.DataFrame]]] = None):
+        super().__init__()
+        self.tables = tables or {}
+        self.host = 'memory'
+        self.database = 'memory'
+
+    def add_table(self, schema: str, table_name: str, df: pd.DataFrame):
+        """Register (or replace) a table"""
+        self.tables.setdefault(schema, {})[table_name] = df
+
+    def _table(self, schema: str, table_name: str) -> pd.DataFrame:
+        try:
+            return self.tables[schema][table_name]
+        except KeyError:
+            raise ValueError(f"Table {schema}.{table_name} not found")
+
+    def get_schemas(self) -> List[str]:
+        return sorted(self.tables)
+
+    def get_tables(self, schema: str) -> List[str]:
+        return sorted(self.tables.get(schema, {}))
+
+    def get_columns(self, schema: str, table_name: str) -> List[Dict[str, str]]:
+        df = self.tables.get(schema, {}).get(table_name)
+        if df is None:
+            return []
+        return [
+            {"name": column, "type": self.TYPE_NAMES.get(dtype.kind, 'character varying')}
+            for column, dtype in df.dtypes.items()
+        ]
+
+    def fetch_table_chunks(self, schema: str, table_name: str, columns: List[str],
+                           batch_size: Optional[int] = None, where: Optional[str] = None,
+                           params: Optional[tuple] = None) -> Iterator[pd.DataFrame]:
+        """Stream the selected columns of a table as DataFrames of at most batch_size rows"""
+        df = self._table(schema, table_name)
+        if where:
+            mask = pd.Series(True, index=df.index)
+            for column, compare, value in simple_conditions(where, params):
+                values = df[column]
+                # Parameters may come back as text (e.g. a persisted watermark)
+                if isinstance(value, str) and pd.api.types.is_datetime64_any_dtype(values.dtype):
+                    value = pd.Timestamp(value)
+                elif isinstance(value, str) and pd.api.types.is_numeric_dtype(values.dtype):
+                    value = pd.to_numeric(value)
+                mask &= compare(values, value).fillna(False).astype(bool)
+            df = df[mask.to_numpy()]
+        df = df[columns]
+        batch_size = batch_size or self.DEFAULT_BATCH_SIZE
+        for start in range(0, len(df), batch_size):
+            yield df.iloc[start:start + batch_size].reset_index(drop=True)
+
+    def count_rows(self, schema: str, table_name: str) -> int:
+        return len(self._table(schema, table_name))
+
+    def sample_rows(self, schema: str, table_name: str, columns: List[str], size: int) -> pd.DataFrame:
+        """Random sample of about size rows
+
+        The seed is fixed per table, so estimates are repeatable, and differs across
+        tables, so samples of row-aligned tables are independent.
+        """
+        df = self._table(schema, table_name)[columns]
+        seed = zlib.crc32(f"{schema}.{table_name}".encode())
+        return df.sample(min(size, len(df)), random_state=seed).reset_index(drop=True)
+
+    def get_freshness_marker(self, schema: str, table_name: str,
+                             updated_at_column: Optional[str] = None) -> str:
+        """Row count (and optional MAX(updated_at)) joined as a string"""
+        df = self._table(schema, table_name)
+        values = [len(df)]
+        if updated_at_column:
+            values.append(df[updated_at_column].max())
+        return "|".join(str(value) for value in values)
@@ -1,28 +1,162 @@
+import time
+import uuid
+import threading
 import psycopg2
+import psycopg2.pool
 import pandas as pd
-from typing import List, Dict, Optional
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Iterator, Callable, Any, Tuple
+from src.connectors.base_connector import BaseConnector
 
-class RedshiftConnector:
-    def __init__(self):
-        self.connection = None
+class RedshiftConnector(BaseConnector):
+    # Rows fetched per round trip when streaming tables
+    DEFAULT_BATCH_SIZE = 50_000
+    
+    # Seconds catalog query results (schemas, tables, columns) are reused
+    CATALOG_TTL = 300
+    
+    # normalize_email in SQL: trimmed, lowercased, without 'mailto:', then the first
+    # '.at.' / '(at)' / '[at]' / ' at ' of addresses without '@' becomes '@'
+    _EMAIL_TRIMMED = (
+        "REGEXP_REPLACE(REGEXP_REPLACE(LOWER(CAST({column} AS VARCHAR)), "
+        "'^[[:space:]]+|[[:space:]]+$', ''), '^mailto:', '')"
+    )
+    _EMAIL_OBFUSCATION = "'[[:space:]]*([.]at[.]|[(]at[)]|[[]at[]]|[[:space:]]+at[[:space:]]+)[[:space:]]*'"
+    _EMAIL_DEOBFUSCATED = (
+        f"CASE WHEN POSITION('@' IN {_EMAIL_TRIMMED}) > 0 "
+        f"OR REGEXP_INSTR({_EMAIL_TRIMMED}, {_EMAIL_OBFUSCATION}) = 0 THEN {_EMAIL_TRIMMED} "
+        f"ELSE LEFT({_EMAIL_TRIMMED}, REGEXP_INSTR({_EMAIL_TRIMMED}, {_EMAIL_OBFUSCATION}) - 1) || '@' || "
+        f"SUBSTRING({_EMAIL_TRIMMED}, REGEXP_INSTR({_EMAIL_TRIMMED}, {_EMAIL_OBFUSCATION}, 1, 1, 1)) END"
+    )
+    
+    # SQL expressions normalizing exact-match keys the same way as src/model/normalization.py
+    SQL_NORMALIZERS = {
+        'identity': "LOWER(REGEXP_REPLACE(CAST({column} AS VARCHAR), '[^0-9A-Za-z]', ''))",
+        # +tags are dropped and whitespace removed last, as in normalize_email
+        'email': f"REGEXP_REPLACE(REGEXP_REPLACE({_EMAIL_DEOBFUSCATED}, '[+][^@]*@', '@'), '[[:space:]]+', '')",
+    }
+    
+    # Pooled connections idle for longer than this many seconds are checked with SELECT 1
+    HEALTH_CHECK_INTERVAL = 60
+    
+    supports_pushdown = True
+    
+    def __init__(self, catalog_ttl: Optional[float] = None):
+        super().__init__()
+        self.pool = None
+        self.catalog_ttl = self.CATALOG_TTL if catalog_ttl is None else catalog_ttl
+        self._catalog_cache: Dict[tuple, tuple] = {}
+        self._catalog_lock = threading.Lock()
+        self._pool_slots = None
+        self._last_used: Dict[int, float] = {}
+        self._legacy_connection = None
         
-    def connect(self, host: str, database: str, user: str, password: str, port: int = 5439) -> bool:
-        """Establish connection to Redshift database"""
+    def connect(self, host: str, database: str, user: str, password: str, port: int = 5439,
+                min_connections: int = 1, max_connections: int = 8) -> bool:
+        """Establish a thread-safe pool of connections to the Redshift database"""
         try:
-            self.connection = psycopg2.connect(
+            self.pool = psycopg2.pool.ThreadedConnectionPool(
+                min_connections,
+                max_connections,
                 host=host,
                 database=database,
                 user=user,
                 password=password,
                 port=port
             )
+            self._pool_slots = threading.BoundedSemaphore(max_connections)
+            self.host = host
+            self.database = database
             return True
         except Exception as e:
             raise ConnectionError(f"Failed to connect to Redshift: {str(e)}")
     
+    def _is_healthy(self, connection) -> bool:
+        """Check a pooled connection before handing it out"""
+        if connection.closed:
+            return False
+        if time.monotonic() - self._last_used.get(id(connection), 0) < self.HEALTH_CHECK_INTERVAL:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+    
+    @contextmanager
+    def get_connection(self):
+        """Borrow a healthy connection from the pool, reconnecting if needed
+        
+        Blocks while every pooled connection is in use. The connection is rolled back
+        when returned, and discarded if it failed at the connection level.
+        """
+        if not self.pool:
+            raise ConnectionError("Not connected to database")
+        
+        with self._pool_slots:
+            connection = self.pool.getconn()
+            if not self._is_healthy(connection):
+                self._last_used.pop(id(connection), None)
+                self.pool.putconn(connection, close=True)
+                connection = self.pool.getconn()
+            
+            broken = False
+            try:
+                yield connection
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                broken = True
+                raise
+            finally:
+                if not broken and not connection.closed:
+                    try:
+                        connection.rollback()
+                    except psycopg2.Error:
+                        broken = True
+                discard = broken or bool(connection.closed)
+                if discard:
+                    self._last_used.pop(id(connection), None)
+                else:
+                    self._last_used[id(connection)] = time.monotonic()
+                self.pool.putconn(connection, close=discard)
+    
+    @property
+    def connection(self):
+        """Dedicated connection for callers that run their own SQL (e.g. test setup)
+        
+        It is taken out of the pool for the lifetime of the connector.
+        """
+        if not self.pool:
+            return None
+        if self._legacy_connection is None or self._legacy_connection.closed:
+            self._pool_slots.acquire()
+            self._legacy_connection = self.pool.getconn()
+        return self._legacy_connection
+    
+    def _cached_catalog(self, key: tuple, loader: Callable[[], Any]) -> Any:
+        """Return a catalog query result from the cache, running the loader when it expired"""
+        with self._catalog_lock:
+            entry = self._catalog_cache.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.catalog_ttl:
+                return entry[1]
+        
+        value = loader()
+        with self._catalog_lock:
+            self._catalog_cache[key] = (time.monotonic(), value)
+        return value
+    
+    def refresh_catalog(self, schema: Optional[str] = None):
+        """Drop cached catalog results, for one schema or for the whole database"""
+        with self._catalog_lock:
+            if schema is None:
+                self._catalog_cache.clear()
+            else:
+                self._catalog_cache.pop(('columns', schema), None)
+    
     def get_schemas(self) -> List[str]:
         """Get list of all schemas in the database"""
-        if not self.connection:
+        if not self.pool:
             raise ConnectionError("Not connected to database")
             
         query = """
@@ -32,44 +166,157 @@ class RedshiftConnector:
             ORDER BY schema_name
         """
         
-        with self.connection.cursor() as cursor:
-            cursor.execute(query)
-            return [schema[0] for schema in cursor.fetchall()]
+        def load():
+            with self.get_connection() as connection, connection.cursor() as cursor:
+                cursor.execute(query)
+                return [schema[0] for schema in cursor.fetchall()]
+        
+        return self._cached_catalog(('schemas',), load)
     
-    def get_tables(self, schema: str) -> List[str]:
-        """Get list of all tables in the specified schema"""
-        if not self.connection:
+    def get_schema_columns(self, schema: str) -> Dict[str, List[Dict[str, str]]]:
+        """Get column information for every table in the schema with a single query"""
+        if not self.pool:
             raise ConnectionError("Not connected to database")
             
         query = """
-            SELECT table_name 
-            FROM information_schema.tables 
+            SELECT table_name, column_name, data_type
+            FROM information_schema.columns
             WHERE table_schema = %s
-            ORDER BY table_name
+            ORDER BY table_name, ordinal_position
         """
         
-        with self.connection.cursor() as cursor:
-            cursor.execute(query, (schema,))
-            return [table[0] for table in cursor.fetchall()]
+        def load():
+            tables = {}
+            with self.get_connection() as connection, connection.cursor() as cursor:
+                cursor.execute(query, (schema,))
+                for table_name, column_name, data_type in cursor.fetchall():
+                    tables.setdefault(table_name, []).append({"name": column_name, "type": data_type})
+            return tables
+        
+        return self._cached_catalog(('columns', schema), load)
+    
+    def get_tables(self, schema: str) -> List[str]:
+        """Get list of all tables in the specified schema"""
+        return sorted(self.get_schema_columns(schema))
     
     def get_columns(self, schema: str, table_name: str) -> List[Dict[str, str]]:
         """Get column information for specified table in schema"""
-        if not self.connection:
+        return self.get_schema_columns(schema).get(table_name, [])
+    
+    def fetch_table_chunks(self, schema: str, table_name: str, columns: List[str],
+                           batch_size: Optional[int] = None, where: Optional[str] = None,
+                           params: Optional[tuple] = None) -> Iterator[pd.DataFrame]:
+        """Stream the selected columns of a table as DataFrames of at most batch_size rows
+        
+        Uses a server-side (named) cursor, so only one batch is held in memory at a time.
+        An optional WHERE clause (with %s placeholders bound to params) filters the rows.
+        """
+        if not self.pool:
             raise ConnectionError("Not connected to database")
-            
-        query = """
-            SELECT column_name, data_type
-            FROM information_schema.columns
-            WHERE table_schema = %s
-            AND table_name = %s
-            ORDER BY ordinal_position
+        
+        batch_size = batch_size or self.DEFAULT_BATCH_SIZE
+        query = f"SELECT {', '.join(columns)} FROM {schema}.{table_name}"
+        if where:
+            query += f" WHERE {where}"
+        
+        with self.get_connection() as connection, \
+                connection.cursor(name=f"unique_{uuid.uuid4().hex}") as cursor:
+            cursor.itersize = batch_size
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+    
+    def count_rows(self, schema: str, table_name: str) -> int:
+        """SELECT COUNT(*) of a table"""
+        if not self.pool:
+            raise ConnectionError("Not connected to database")
+        
+        with self.get_connection() as connection, connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {schema}.{table_name}")
+            return cursor.fetchone()[0]
+    
+    def sample_rows(self, schema: str, table_name: str, columns: List[str], size: int) -> pd.DataFrame:
+        """Random sample of about size rows
+        
+        Redshift has no TABLESAMPLE, so rows are kept with a probability sized from
+        COUNT(*) (with some slack) and the result is capped with LIMIT; the table is
+        scanned once but never sorted or shipped whole.
         """
+        if not self.pool:
+            raise ConnectionError("Not connected to database")
         
-        with self.connection.cursor() as cursor:
-            cursor.execute(query, (schema, table_name))
-            return [{"name": col[0], "type": col[1]} for col in cursor.fetchall()]
+        fraction = min(1.0, 1.5 * size / max(self.count_rows(schema, table_name), 1))
+        query = f"SELECT {', '.join(columns)} FROM {schema}.{table_name} WHERE RANDOM() < %s LIMIT %s"
+        with self.get_connection() as connection, connection.cursor() as cursor:
+            cursor.execute(query, (fraction, size))
+            return pd.DataFrame.from_records(cursor.fetchall(), columns=columns, coerce_float=True)
+    
+    def find_exact_matches(self, schema1: str, table1: str, key1: str,
+                           schema2: str, table2: str, key2: str,
+                           column_pairs: List[Tuple[str, str, str]]) -> pd.DataFrame:
+        """Find pairs of rows with equal normalized keys with a join in the warehouse
+        
+        column_pairs holds (column1, column2, kind) tuples, kind being a key of
+        SQL_NORMALIZERS. Rows match when any pair is equal. Returns the key pairs as
+        table1_id / table2_id.
+        """
+        if not self.pool:
+            raise ConnectionError("Not connected to database")
+        
+        joins = []
+        for column1, column2, kind in column_pairs:
+            normalizer = self.SQL_NORMALIZERS[kind]
+            expression1 = normalizer.format(column=f"t1.{column1}")
+            expression2 = normalizer.format(column=f"t2.{column2}")
+            joins.append(f"""
+                SELECT t1.{key1} AS table1_id, t2.{key2} AS table2_id
+                FROM {schema1}.{table1} t1
+                JOIN {schema2}.{table2} t2 ON {expression1} = {expression2}
+                WHERE {expression1} <> ''
+            """)
+        query = " UNION ".join(joins)
+        
+        with self.get_connection() as connection, connection.cursor() as cursor:
+            cursor.execute(query)
+            return pd.DataFrame(cursor.fetchall(), columns=['table1_id', 'table2_id'])
+    
+    def exact_match_residual_filter(self, schema: str, table: str, other_schema: str, other_table: str,
+                                    column_pairs: List[Tuple[str, str, str]]) -> str:
+        """WHERE clause selecting the rows of a table without an exact match in the other table
+        
+        column_pairs holds (column, other_column, kind) tuples, as in find_exact_matches.
+        """
+        conditions = []
+        for column, other_column, kind in column_pairs:
+            normalizer = self.SQL_NORMALIZERS[kind]
+            expression = normalizer.format(column=f"{schema}.{table}.{column}")
+            other_expression = normalizer.format(column=f"other.{other_column}")
+            conditions.append(
+                f"NOT EXISTS (SELECT 1 FROM {other_schema}.{other_table} other "
+                f"WHERE {other_expression} = {expression} AND {expression} <> '')"
+            )
+        return " AND ".join(conditions)
+    
+    def get_freshness_marker(self, schema: str, table_name: str,
+                             updated_at_column: Optional[str] = None) -> str:
+        """Cheap marker that changes when the table changes (row count and optional MAX(updated_at))"""
+        if not self.pool:
+            raise ConnectionError("Not connected to database")
+        
+        query = f"SELECT COUNT(*) FROM {schema}.{table_name}"
+        if updated_at_column:
+            query = f"SELECT COUNT(*), MAX({updated_at_column}) FROM {schema}.{table_name}"
+        
+        with self.get_connection() as connection, connection.cursor() as cursor:
+            cursor.execute(query)
+            return "|".join(str(value) for value in cursor.fetchone())
     
     def close(self):
-        """Close the database connection"""
-        if self.connection:
-            self.connection.close() 
\ No newline at end of file
+        """Close every pooled connection"""
+        if self.pool:
+            self.pool.closeall()
+            self.pool = None
+            self._legacy_connection = None
\ No newline at end of file
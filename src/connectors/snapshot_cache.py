@@ -0,0 +1,155 @@
+import os
+import uuid
+import hashlib
+import json
+import pandas as pd
+import pyarrow as pa
+from typing import List, Optional, Iterator
+from src.connectors.file_connector import arrow_schema
+
+
+class SnapshotCache:
+    """Local on-disk cache of fetched tables stored as Arrow IPC files
+
+    Snapshots are keyed by host, database, schema, table, column set and an optional
+    freshness marker, memory-mapped when read back, and evicted least recently used
+    first once the cache grows beyond max_bytes.
+    """
+
+    def __init__(self, cache_dir: str = '.unique_cache', max_bytes: int = 5 * 1024 ** 3,
+                 freshness: Optional[str] = None):
+        """
+        freshness: None to trust snapshots until invalidated, 'row_count' to compare
+        COUNT(*), or the name of an updated_at column whose MAX() is compared.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.freshness = freshness
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def make_key(self, host: str, database: str, schema: str, table: str, columns: List[str],
+                 freshness_marker: Optional[str] = None, variant: Optional[str] = None) -> str:
+        """Build the snapshot key; the schema and table stay readable for invalidation
+
+        variant distinguishes derived snapshots of the same data (e.g. with normalized columns).
+        """
+        payload = json.dumps([host, database, schema, table, list(columns), freshness_marker, variant])
+        digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+        return f"{schema}__{table}__{digest}"
+
+    def freshness_marker(self, connector, schema: str, table: str) -> Optional[str]:
+        """Ask the warehouse for the freshness marker configured for this cache"""
+        if self.freshness is None:
+            return None
+        if self.freshness == 'row_count':
+            return connector.get_freshness_marker(schema, table)
+        return connector.get_freshness_marker(schema, table, updated_at_column=self.freshness)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.arrow")
+
+    def contains(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """Read a snapshot back through a memory map, or None if it is not cached"""
+        chunks = self.get_chunks(key)
+        if chunks is None:
+            return None
+        frames = list(chunks)
+        return pd.concat(frames, ignore_index=True) if frames else None
+
+    def get_chunks(self, key: str, chunk_size: Optional[int] = None) -> Optional[Iterator[pd.DataFrame]]:
+        """Iterate over a snapshot in DataFrames of at most chunk_size rows"""
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        # Touch the file so eviction sees it as recently used
+        os.utime(path)
+        return self._read_chunks(path, chunk_size)
+
+    def _read_chunks(self, path: str, chunk_size: Optional[int]) -> Iterator[pd.DataFrame]:
+        with pa.memory_map(path, 'r') as source:
+            table = pa.ipc.open_file(source).read_all()
+            if chunk_size is None:
+                yield table.to_pandas()
+                return
+            for start in range(0, table.num_rows, chunk_size):
+                yield table.slice(start, chunk_size).to_pandas()
+
+    def put(self, key: str, df: pd.DataFrame):
+        """Store a whole DataFrame as a snapshot"""
+        for _ in self.write_through(key, iter([df])):
+            pass
+
+    def write_through(self, key: str, chunks: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """Yield the chunks unchanged while writing them to a snapshot
+
+        The snapshot only becomes visible once every chunk has been written. If a
+        chunk cannot be converted to the schema of the first one, caching is
+        abandoned and the remaining chunks are still yielded.
+        """
+        final_path = self._path(key)
+        temp_path = f"{final_path}.{uuid.uuid4().hex}.tmp"
+        writer = None
+        schema = None
+        caching = True
+        completed = False
+        try:
+            for chunk in chunks:
+                if caching:
+                    try:
+                        if writer is None:
+                            schema = arrow_schema(chunk)
+                            writer = pa.ipc.new_file(temp_path, schema)
+                        writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+                    except (pa.ArrowException, ValueError, TypeError):
+                        caching = False
+                yield chunk
+            completed = True
+        finally:
+            if writer is not None:
+                writer.close()
+            if caching and completed and writer is not None:
+                os.replace(temp_path, final_path)
+                self.evict()
+            elif os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def invalidate(self, schema: Optional[str] = None, table: Optional[str] = None) -> int:
+        """Remove the snapshots of a table (or schema); returns the number of files removed"""
+        prefix = ''
+        if schema is not None:
+            prefix = f"{schema}__" if table is None else f"{schema}__{table}__"
+        removed = 0
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.arrow') and name.startswith(prefix):
+                os.remove(os.path.join(self.cache_dir, name))
+                removed += 1
+        return removed
+
+    def clear(self) -> int:
+        """Remove every snapshot"""
+        return self.invalidate()
+
+    def size(self) -> int:
+        """Total size of the cached snapshots in bytes"""
+        return sum(size for _, size, _ in self._entries())
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.arrow'):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((name, stat.st_size, stat.st_mtime))
+        return entries
+
+    def evict(self):
+        """Remove least recently used snapshots until the cache fits in max_bytes"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for name, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
@@ -0,0 +1,51 @@
+import numpy as np
+
+
+class UnionFind:
+    """Disjoint sets over record positions 0..n-1, merged with whole arrays of edges
+
+    Every non-root points to a smaller position, so the forest never has cycles
+    and roots are the smallest member of their set.
+    """
+
+    def __init__(self, n: int):
+        self.parent = np.arange(n, dtype=np.int64)
+
+    def _compress(self):
+        """Point every node directly at its root (pointer jumping)"""
+        parent = self.parent
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+        self.parent = parent
+
+    def find(self, nodes: np.ndarray) -> np.ndarray:
+        """Root of every node"""
+        self._compress()
+        return self.parent[nodes]
+
+    def union(self, a: np.ndarray, b: np.ndarray):
+        """Merge the sets of a[i] and b[i] for every edge i
+
+        Each pass hooks the larger root of an edge onto the smaller one. When several
+        edges hook the same root it takes the smallest of their roots (np.minimum.at),
+        so a hub record settles in one pass; edges still between two sets are retried
+        with the updated roots.
+        """
+        a = np.asarray(a, dtype=np.int64)
+        b = np.asarray(b, dtype=np.int64)
+        while len(a):
+            root_a, root_b = self.find(a), self.find(b)
+            pending = root_a != root_b
+            root_a, root_b = root_a[pending], root_b[pending]
+            np.minimum.at(self.parent, np.maximum(root_a, root_b), np.minimum(root_a, root_b))
+            a, b = a[pending], b[pending]
+
+    def components(self) -> np.ndarray:
+        """Dense cluster id of every node, numbered by first appearance"""
+        roots = self.find(np.arange(len(self.parent)))
+        # Roots are the smallest member of their set, so sorted roots follow first appearance
+        _, cluster_ids = np.unique(roots, return_inverse=True)
+        return cluster_ids.astype(np.int64)
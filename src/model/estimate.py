@@ -0,0 +1,261 @@
+import time
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from src.model.blocking import Blocker, BlockingKey, CandidatePairs, BlockingRule, SortedNeighborhood, TfidfNeighbors
+from src.model.normalization import add_normalized_columns, normalized_values
+from src.model.scoring import ComparisonPlan, ScoringCounters, score_candidates
+
+if TYPE_CHECKING:
+    from src.model.model_run import ColumnMetadata, UniqueIdentifier
+
+# Rows sampled from each table by default
+DEFAULT_SAMPLE_SIZE = 10_000
+
+# Scoring throughput is measured on at least this many pairs (random pairs of the samples are added when needed)
+MIN_TIMING_PAIRS = 5_000
+
+
+class BudgetExceeded(Exception):
+    """Raised when a run is refused because its estimated cost is over budget"""
+
+
+@dataclass
+class RunBudget:
+    """Limits a run is checked against before it starts (None means no limit)
+
+    Runs estimated over budget raise BudgetExceeded when refuse is set, otherwise
+    they start with a warning.
+    """
+    max_seconds: Optional[float] = None
+    max_memory_bytes: Optional[int] = None
+    max_candidate_pairs: Optional[int] = None
+    refuse: bool = False
+
+
+@dataclass
+class RunEstimate:
+    """Estimated size and cost of a run, extrapolated from samples of both tables"""
+    rows1: int
+    rows2: int
+    sample_rows1: int
+    sample_rows2: int
+    candidate_pairs: int
+    pairs_per_rule: Dict[str, int]
+    matches: int
+    stage_seconds: Dict[str, float]
+    memory_bytes: int
+    recommendations: List[str] = field(default_factory=list)
+    over_budget: List[str] = field(default_factory=list)
+
+    @property
+    def seconds(self) -> float:
+        return sum(self.stage_seconds.values())
+
+    @property
+    def cross_product_pairs(self) -> int:
+        return self.rows1 * self.rows2
+
+    @property
+    def within_budget(self) -> bool:
+        return not self.over_budget
+
+    def check(self, budget: RunBudget) -> List[str]:
+        """Compare the estimate with a budget; returns (and keeps) the limits it exceeds"""
+        self.over_budget = []
+        if budget.max_seconds is not None and self.seconds > budget.max_seconds:
+            self.over_budget.append(f"estimated runtime {self.seconds:,.0f}s exceeds {budget.max_seconds:,.0f}s")
+        if budget.max_memory_bytes is not None and self.memory_bytes > budget.max_memory_bytes:
+            self.over_budget.append(
+                f"estimated memory {self.memory_bytes / 1024 ** 3:,.1f} GB exceeds "
+                f"{budget.max_memory_bytes / 1024 ** 3:,.1f} GB"
+            )
+        if budget.max_candidate_pairs is not None and self.candidate_pairs > budget.max_candidate_pairs:
+            self.over_budget.append(
+                f"estimated {self.candidate_pairs:,} candidate pairs exceed {budget.max_candidate_pairs:,}"
+            )
+        return self.over_budget
+
+
+class CostEstimator:
+    """Dry run of find_unique_users on random samples of both tables
+
+    Row counts come from the connector (COUNT(*)), samples from its sample_rows
+    (TABLESAMPLE or a random filter with LIMIT, depending on the source). Candidate
+    pairs are extrapolated rule by rule from the block key frequencies of the
+    samples; normalization, blocking and scoring are timed on the samples and scaled
+    to the full tables. Estimates are meant to tell seconds from hours, not to be exact.
+    """
+    # Assumed transfer rate from the source, in bytes of in-memory data per second
+    TRANSFER_BYTES_PER_SECOND = 50 * 1024 ** 2
+
+    # Bytes held per candidate pair (left and right indexes) and per match (ids and score)
+    PAIR_BYTES = 16
+    MATCH_BYTES = 20
+
+    def __init__(self, identifier: 'UniqueIdentifier', sample_size: int = DEFAULT_SAMPLE_SIZE):
+        self.identifier = identifier
+        self.sample_size = sample_size
+
+    def _sample(self, schema: str, table: str, columns_meta: List['ColumnMetadata']
+                ) -> Tuple[int, pd.DataFrame, float, float, float]:
+        """Row count, normalized sample, seconds to fetch and normalize it, and raw bytes per row"""
+        connector = self.identifier.connector
+        rows = connector.count_rows(schema, table)
+        start = time.perf_counter()
+        sample = connector.sample_rows(schema, table, [col.name for col in columns_meta], self.sample_size)
+        fetch_seconds = time.perf_counter() - start
+
+        raw_bytes = sample.memory_usage(index=False, deep=True).sum() / len(sample) if len(sample) else 0.0
+        start = time.perf_counter()
+        sample = add_normalized_columns(sample.reset_index(drop=True), columns_meta)
+        normalize_seconds = time.perf_counter() - start
+        return rows, sample, fetch_seconds, normalize_seconds, raw_bytes
+
+    @staticmethod
+    def _rule_pairs(blocker: Blocker, rule: BlockingRule, keys1: pd.Series, keys2: pd.Series,
+                    rows1: int, rows2: int, scale1: float, scale2: float) -> float:
+        """Candidate pairs a rule would emit on the full tables"""
+        # Neighbourhood keys pair every record with a bounded number of others, estimated at the bound
+        if isinstance(rule.key, TfidfNeighbors):
+            return float(rows1 * rule.key.k)
+        if isinstance(rule.key, SortedNeighborhood):
+            return float((rule.key.window - 1) * (rows1 + rows2))
+        if type(rule.key).pairs is BlockingKey.pairs:
+            # Equal keys: scale the size of every block on both sides, skipping oversized blocks
+            counts1, counts2 = (keys1.dropna().value_counts() * scale1).align(
+                keys2.dropna().value_counts() * scale2, join='inner'
+            )
+            kept = counts1 + counts2 <= blocker.max_block_size if blocker.max_block_size else slice(None)
+            return float((counts1 * counts2)[kept].sum())
+        return len(rule.key.pairs(keys1, keys2, blocker.max_block_size)) * scale1 * scale2
+
+    def recommend(self, columns1_meta: List['ColumnMetadata'], columns2_meta: List['ColumnMetadata'],
+                  blocker: Blocker, pairs_per_rule: Dict[str, int], rows1: int, rows2: int) -> List[str]:
+        """Blocking keys suggested by the column categories, and notes on the selected columns"""
+        identifier = self.identifier
+        notes = [
+            f"'{col.name}' is not recognized as an identity, contact or name column, "
+            "so it is neither blocked on nor compared"
+            for col in [*columns1_meta, *columns2_meta] if col.category == 'other'
+        ]
+        recommended = Blocker.from_columns(columns1_meta, columns2_meta, text_matcher=identifier.text_matcher)
+        labels = {blocker.rule_label(rule) for rule in blocker.rules}
+        for rule in recommended.rules:
+            label = recommended.rule_label(rule)
+            if label not in labels:
+                notes.append(f"Consider blocking on {label}, derived from the column categories")
+        if not blocker.rules:
+            notes.append(
+                f"No blocking rule applies: all {rows1 * rows2:,} pairs of rows would be compared. "
+                "Select identity, email, phone or name columns on both sides"
+            )
+        total = sum(pairs_per_rule.values())
+        for rule in blocker.rules:
+            label = blocker.rule_label(rule)
+            pairs = pairs_per_rule.get(label, 0)
+            if len(blocker.rules) < 2 or pairs <= 0.5 * total:
+                continue
+            if isinstance(rule.key, TfidfNeighbors):
+                remedy = f"a lower k (now {rule.key.k}) or a higher min_similarity"
+            elif isinstance(rule.key, SortedNeighborhood):
+                remedy = f"a smaller window (now {rule.key.window})"
+            else:
+                remedy = f"a lower max_block_size (now {blocker.max_block_size})"
+            notes.append(
+                f"{label} emits most candidate pairs ({pairs:,}); {remedy} or dropping the rule would cut them"
+            )
+        return notes
+
+    def estimate(self, schema1: str, table1: str, columns1: List[str],
+                 schema2: str, table2: str, columns2: List[str],
+                 blocker: Optional[Blocker] = None, workers: int = 1,
+                 chunk_size: Optional[int] = None, budget: Optional[RunBudget] = None) -> RunEstimate:
+        """Estimate candidate pairs, runtime and memory of a run without running it"""
+        identifier = self.identifier
+        columns1_meta = identifier.get_columns_metadata(schema1, table1, columns1)
+        columns2_meta = identifier.get_columns_metadata(schema2, table2, columns2)
+        if blocker is None:
+            blocker = Blocker.from_columns(columns1_meta, columns2_meta, text_matcher=identifier.text_matcher)
+
+        rows1, sample1, fetch_seconds1, normalize_seconds1, raw_bytes1 = self._sample(schema1, table1, columns1_meta)
+        rows2, sample2, fetch_seconds2, normalize_seconds2, raw_bytes2 = self._sample(schema2, table2, columns2_meta)
+        n1, n2 = len(sample1), len(sample2)
+        scale1, scale2 = rows1 / n1 if n1 else 0.0, rows2 / n2 if n2 else 0.0
+
+        # Candidate pairs, rule by rule, then the overlap of the rules as seen on the samples
+        rng = np.random.default_rng(0)
+        if blocker.rules:
+            start = time.perf_counter()
+            sample_candidates = blocker.candidate_pairs(sample1, sample2)
+            blocking_seconds = time.perf_counter() - start
+            keys1, keys2 = blocker.block_keys(sample1, 1), blocker.block_keys(sample2, 2)
+            pairs_per_rule = {
+                blocker.rule_label(rule): int(self._rule_pairs(
+                    blocker, rule, keys1[blocker.rule_label(rule)], keys2[blocker.rule_label(rule)],
+                    rows1, rows2, scale1, scale2
+                ))
+                for rule in blocker.rules
+            }
+            sample_total = sum(sample_candidates.pairs_per_rule.values())
+            overlap = len(sample_candidates) / sample_total if sample_total else 1.0
+            candidate_pairs = min(int(sum(pairs_per_rule.values()) * overlap), rows1 * rows2)
+        else:
+            # The cross product of the samples would be as costly as the run, random pairs stand in for it
+            size = min(MIN_TIMING_PAIRS, n1 * n2)
+            sample_candidates = CandidatePairs(rng.integers(0, n1, size), rng.integers(0, n2, size), n1 * n2)
+            blocking_seconds = 0.0
+            pairs_per_rule = {}
+            candidate_pairs = rows1 * rows2
+
+        # Scoring throughput and match rate, on the sample candidates plus random pairs if they are too few
+        values1, values2 = normalized_values(sample1), normalized_values(sample2)
+        plan = ComparisonPlan.compile(identifier.get_column_pairs(columns1_meta, columns2_meta), values2)
+        start = time.perf_counter()
+        matched, _, _, _ = score_candidates(values1, values2, sample_candidates.left, sample_candidates.right,
+                                            plan, identifier.SIMILARITY_THRESHOLD, counters=ScoringCounters())
+        timed_pairs = len(sample_candidates)
+        extra = min(MIN_TIMING_PAIRS, n1 * n2) - timed_pairs
+        if extra > 0:
+            score_candidates(values1, values2, rng.integers(0, n1, extra), rng.integers(0, n2, extra),
+                             plan, identifier.SIMILARITY_THRESHOLD, counters=ScoringCounters())
+            timed_pairs += extra
+        seconds_per_pair = (time.perf_counter() - start) / timed_pairs if timed_pairs else 0.0
+        match_rate = len(matched) / len(sample_candidates) if len(sample_candidates) else 0.0
+        matches = int(candidate_pairs * match_rate)
+
+        # Nearest neighbour search compares every pair of rows, other keys grow with the rows
+        if any(isinstance(rule.key, TfidfNeighbors) for rule in blocker.rules):
+            blocking_scale = scale1 * scale2
+        else:
+            blocking_scale = (rows1 + rows2) / max(n1 + n2, 1)
+        scoring_workers = workers if workers > 1 and candidate_pairs >= identifier.PARALLEL_MIN_PAIRS else 1
+        stage_seconds = {
+            'fetch': float(fetch_seconds1 + fetch_seconds2
+            + (rows1 * raw_bytes1 + rows2 * raw_bytes2) / self.TRANSFER_BYTES_PER_SECOND),
+            'normalize': normalize_seconds1 * scale1 + normalize_seconds2 * scale2,
+            'blocking': blocking_seconds * blocking_scale,
+            'scoring': seconds_per_pair * candidate_pairs / scoring_workers,
+        }
+
+        # Both tables (with their normalized copies) are held, or one chunk of the first one
+        held_rows1 = min(chunk_size, rows1) if chunk_size else rows1
+        bytes_per_row1 = sample1.memory_usage(index=False, deep=True).sum() / n1 if n1 else 0.0
+        bytes_per_row2 = sample2.memory_usage(index=False, deep=True).sum() / n2 if n2 else 0.0
+        held_pairs = candidate_pairs * held_rows1 / rows1 if rows1 else 0
+        memory_bytes = int(
+            held_rows1 * bytes_per_row1 + rows2 * bytes_per_row2
+            + held_pairs * self.PAIR_BYTES + matches * self.MATCH_BYTES
+        )
+
+        estimate = RunEstimate(
+            rows1=rows1, rows2=rows2, sample_rows1=n1, sample_rows2=n2,
+            candidate_pairs=candidate_pairs, pairs_per_rule=pairs_per_rule, matches=matches,
+            stage_seconds=stage_seconds, memory_bytes=memory_bytes,
+            recommendations=self.recommend(columns1_meta, columns2_meta, blocker, pairs_per_rule, rows1, rows2)
+        )
+        if budget is not None:
+            estimate.check(budget)
+        return estimate
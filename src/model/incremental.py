@@ -0,0 +1,189 @@
+import os
+import json
+import shutil
+import hashlib
+import pandas as pd
+from typing import List, Optional
+from src.model.blocking import Blocker
+from src.model.model_run import UniqueIdentifier
+from src.model.normalization import add_normalized_columns, normalized_values
+from src.model.parallel import ScoringPool
+from src.model.progress import RunProgress
+
+
+class IncrementalMatcher:
+    """Incremental matching of two tables that are re-resolved regularly
+
+    Both sides (selected columns indexed by their key column), their block keys and
+    the current match set are persisted in state_dir. Each run only fetches rows whose
+    watermark column is at or past the last seen value, skipping the rows already
+    processed at that value, scores the changed rows against the stored index and
+    merges the results into the existing match set.
+
+    Rows deleted at the source are not detected; call reset() to rebuild from scratch.
+    """
+
+    def __init__(self, identifier: UniqueIdentifier, state_dir: str = '.unique_state'):
+        self.identifier = identifier
+        self.state_dir = state_dir
+        # Number of changed rows fetched from each table by the last run
+        self.last_delta_sizes = (0, 0)
+
+    def _state_path(self, schema1: str, table1: str, columns1: List[str], key1: str,
+                    schema2: str, table2: str, columns2: List[str], key2: str, blocker: Blocker) -> str:
+        payload = json.dumps([
+            schema1, table1, list(columns1), key1, schema2, table2, list(columns2), key2,
+            [blocker.rule_label(rule) for rule in blocker.rules]
+        ])
+        digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.state_dir, f"{schema1}.{table1}__{schema2}.{table2}__{digest}")
+
+    def _load_frame(self, path: str, name: str, index: str, drop: bool = True) -> Optional[pd.DataFrame]:
+        """Load a persisted frame indexed by the key column (also kept as a column unless drop)"""
+        file_path = os.path.join(path, f"{name}.parquet")
+        if not os.path.exists(file_path):
+            return None
+        return pd.read_parquet(file_path).set_index(index, drop=drop)
+
+    def _save_frame(self, path: str, name: str, df: pd.DataFrame, index: str):
+        # A key that is also a selected column is already saved with the columns
+        df.rename_axis(index).reset_index(drop=index in df.columns).to_parquet(
+            os.path.join(path, f"{name}.parquet"), index=False
+        )
+
+    def _fetch_delta(self, schema: str, table: str, columns: List[str], key: str,
+                     watermark: str, last_watermark, seen_keys: list) -> pd.DataFrame:
+        """Fetch rows changed since the last watermark (all rows on the first run)
+
+        Rows written with the last watermark after the previous run read it are only
+        caught with >=, so the rows seen_keys already processed at it are dropped.
+        """
+        fetch_columns = list(dict.fromkeys([key, *columns, watermark]))
+        where, params = None, None
+        if last_watermark is not None:
+            where, params = f"{watermark} >= %s", (last_watermark,)
+        with self.identifier.stage('fetch'):
+            delta = self.identifier.connector.fetch_table(schema, table, fetch_columns, where=where, params=params)
+        self.identifier.last_run_stats.add_fetched(delta)
+        if last_watermark is not None and seen_keys:
+            # The watermark went through the JSON state, compare both as text
+            processed = delta[key].isin(seen_keys) & (delta[watermark].map(str) == str(last_watermark))
+            delta = delta[~processed]
+        # Like _fetch_chunks, a key that is also a selected column stays a column too
+        return delta.drop_duplicates(subset=key, keep='last').set_index(key, drop=key not in columns)
+
+    @staticmethod
+    def _upsert(stored: Optional[pd.DataFrame], delta: pd.DataFrame) -> pd.DataFrame:
+        if stored is None:
+            return delta
+        return pd.concat([stored[~stored.index.isin(delta.index)], delta])
+
+    @staticmethod
+    def _next_watermark(last_watermark, seen_keys: list, delta: pd.DataFrame, watermark: str):
+        """The latest watermark of the delta and the keys of the rows processed at it"""
+        if delta.empty or delta[watermark].isna().all():
+            return last_watermark, seen_keys
+        latest = delta[watermark].max()
+        keys = delta.index[delta[watermark] == latest].tolist()
+        latest = latest.item() if hasattr(latest, 'item') else latest
+        if str(latest) == str(last_watermark):
+            keys = [*seen_keys, *keys]
+        return latest, keys
+
+    def run(self, schema1: str, table1: str, columns1: List[str], key1: str, watermark1: str,
+            schema2: str, table2: str, columns2: List[str], key2: str, watermark2: str,
+            blocker: Optional[Blocker] = None, workers: int = 1,
+            progress: Optional[RunProgress] = None) -> pd.DataFrame:
+        """Fetch the changes of both tables, score them and return the updated match set
+
+        table1_id and table2_id in the results are the values of key1 and key2. The run
+        metrics are kept in the last_run_stats of the identifier.
+        """
+        identifier = self.identifier
+        identifier.begin_run(progress)
+        with identifier.stage('metadata'):
+            columns1_meta = identifier.get_columns_metadata(schema1, table1, columns1)
+            columns2_meta = identifier.get_columns_metadata(schema2, table2, columns2)
+        if blocker is None:
+            blocker = Blocker.from_columns(columns1_meta, columns2_meta, text_matcher=identifier.text_matcher)
+
+        path = self._state_path(schema1, table1, columns1, key1, schema2, table2, columns2, key2, blocker)
+        os.makedirs(path, exist_ok=True)
+        state = {'watermark1': None, 'watermark2': None}
+        if os.path.exists(os.path.join(path, 'state.json')):
+            with open(os.path.join(path, 'state.json')) as state_file:
+                state = json.load(state_file)
+        seen1, seen2 = state.get('seen1', []), state.get('seen2', [])
+
+        # Fetch only rows added or modified since the last run
+        delta1 = self._fetch_delta(schema1, table1, columns1, key1, watermark1, state['watermark1'], seen1)
+        delta2 = self._fetch_delta(schema2, table2, columns2, key2, watermark2, state['watermark2'], seen2)
+        self.last_delta_sizes = (len(delta1), len(delta2))
+        next_state = {}
+        next_state['watermark1'], next_state['seen1'] = self._next_watermark(
+            state['watermark1'], seen1, delta1, watermark1
+        )
+        next_state['watermark2'], next_state['seen2'] = self._next_watermark(
+            state['watermark2'], seen2, delta2, watermark2
+        )
+
+        # Merge the changes (with their normalized columns) into the stored records and block key index
+        with identifier.stage('normalize'):
+            delta1 = add_normalized_columns(delta1[columns1], columns1_meta)
+            delta2 = add_normalized_columns(delta2[columns2], columns2_meta)
+        records1 = self._upsert(self._load_frame(path, 'records1', key1, drop=key1 not in columns1), delta1)
+        records2 = self._upsert(self._load_frame(path, 'records2', key2, drop=key2 not in columns2), delta2)
+        with identifier.stage('blocking'):
+            keys1 = self._upsert(self._load_frame(path, 'keys1', key1), blocker.block_keys(delta1, 1))
+            keys2 = self._upsert(self._load_frame(path, 'keys2', key2), blocker.block_keys(delta2, 2))
+
+        matches = None
+        if os.path.exists(os.path.join(path, 'matches.parquet')):
+            matches = pd.read_parquet(os.path.join(path, 'matches.parquet'))
+            # Matches involving a changed row are recomputed below
+            matches = matches[~matches['table1_id'].isin(delta1.index) & ~matches['table2_id'].isin(delta2.index)]
+
+        with identifier.stage('plan'):
+            values2 = normalized_values(records2)
+            plan = identifier.compile_plan(columns1_meta, columns2_meta, values2)
+        new_matches = []
+        if len(delta1):
+            with ScoringPool(values2, plan, workers) as pool:
+                new_matches.append(identifier.match_chunk(
+                    delta1, records2, blocker, pool,
+                    keys1=keys1.loc[delta1.index], keys2=keys2.loc[records2.index]
+                ).to_frame())
+        unchanged1 = records1[~records1.index.isin(delta1.index)]
+        if len(delta2) and len(unchanged1):
+            with ScoringPool(normalized_values(delta2), plan, workers) as pool:
+                new_matches.append(identifier.match_chunk(
+                    unchanged1, delta2, blocker, pool,
+                    keys1=keys1.loc[unchanged1.index], keys2=keys2.loc[delta2.index]
+                ).to_frame())
+
+        parts = [part for part in [matches, *new_matches] if part is not None and not part.empty]
+        if parts:
+            matches = pd.concat(parts, ignore_index=True)
+        else:
+            matches = pd.DataFrame(columns=[
+                'table1_id', 'table2_id', 'similarity_score',
+                *[f"table1_{col}" for col in columns1], *[f"table2_{col}" for col in columns2]
+            ])
+        matches = matches.sort_values(['table1_id', 'table2_id'], ignore_index=True)
+
+        # Persist the new state
+        self._save_frame(path, 'records1', records1, key1)
+        self._save_frame(path, 'records2', records2, key2)
+        self._save_frame(path, 'keys1', keys1, key1)
+        self._save_frame(path, 'keys2', keys2, key2)
+        matches.to_parquet(os.path.join(path, 'matches.parquet'), index=False)
+        with open(os.path.join(path, 'state.json'), 'w') as state_file:
+            json.dump(next_state, state_file, default=str)
+
+        identifier.finish_run(len(matches))
+        return matches
+
+    def reset(self):
+        """Drop every persisted state, the next run starts from scratch"""
+        if os.path.exists(self.state_dir):
+            shutil.rmtree(self.state_dir)
@@ -0,0 +1,52 @@
+import json
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Optional
+from src.model.progress import MatchCancelled, RunProgress
+
+
+def job_signature(**inputs) -> str:
+    """Stable signature of the inputs of a run (tables, columns, thresholds, data snapshot)"""
+    payload = json.dumps(inputs, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class MatchJob:
+    """A matching run executed in a background thread
+
+    target is called with progress=<RunProgress> and its return value becomes the
+    result. The status moves from 'running' to 'done', 'failed' or 'cancelled'.
+    """
+
+    def __init__(self, target: Callable[..., Any], **kwargs):
+        self.progress = RunProgress()
+        self.status = 'running'
+        self.result = None
+        self.error: Optional[str] = None
+        # Extra data kept with the job, e.g. files the result was exported to
+        self.artifacts: Dict[str, Any] = {}
+        self._thread = threading.Thread(target=self._run, args=(target, kwargs), daemon=True)
+        self._thread.start()
+
+    def _run(self, target: Callable[..., Any], kwargs: dict):
+        try:
+            self.result = target(progress=self.progress, **kwargs)
+            self.status = 'done'
+        except MatchCancelled:
+            self.status = 'cancelled'
+        except Exception as e:
+            self.error = str(e)
+            self.status = 'failed'
+
+    @property
+    def running(self) -> bool:
+        return self.status == 'running'
+
+    def cancel(self):
+        """Ask the run to stop at its next check; the status changes once it has stopped"""
+        self.progress.cancel()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the run to finish; returns False if it is still running after timeout"""
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
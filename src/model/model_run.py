@@ -1,8 +1,23 @@
-from thefuzz import fuzz
+import warnings
 import pandas as pd
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional, Iterator
+from src.model.blocking import Blocker, BlockingReport, CandidatePairs
+from src.model.scoring import ColumnPair, ComparisonPlan, DistinctColumns, ScoringCounters, score_candidates
+from src.model.normalization import contact_kind
+from src.model.normalization import NORMALIZATION_VERSION, NORMALIZED_PREFIX
+from src.model.normalization import add_normalized_columns, normalized_values, raw_columns
+from src.model.parallel import ScoringPool
+from src.model.clustering import UnionFind
+from src.model.results import MatchResult
+from src.model.progress import RunProgress
+from src.model.stats import RunStats, StatsHook
+from src.model.estimate import DEFAULT_SAMPLE_SIZE, BudgetExceeded, CostEstimator, RunBudget, RunEstimate
+from src.connectors.base_connector import BaseConnector
+from src.connectors.snapshot_cache import SnapshotCache
 
 @dataclass
 class ColumnMetadata:
@@ -10,10 +25,27 @@ class ColumnMetadata:
     type: str
     category: str  # identity, contact, or other
 
+@dataclass
+class SourceTable:
+    """A table taking part in a multi-source resolution"""
+    schema: str
+    table: str
+    columns: List[str]
+    key: Optional[str] = None
+
 class UniqueIdentifier:
     # Threshold for fuzzy matching (can be adjusted)
     SIMILARITY_THRESHOLD = 85
     
+    # Below this many candidate pairs a process pool costs more than it saves
+    PARALLEL_MIN_PAIRS = 100_000
+    
+    # Candidates kept per left record before a one-to-one assignment, when top_k is not given
+    ONE_TO_ONE_CANDIDATES = 5
+    
+    # Ways of comparing name and address columns: edit distance or character n-gram TF-IDF
+    TEXT_MATCHERS = ('ratio', 'tfidf')
+    
     # Define column categories and their weights
     COLUMN_CATEGORIES = {
         'identity': {
@@ -39,8 +71,28 @@ class UniqueIdentifier:
         }
     }
     
-    def __init__(self, redshift_connector):
-        self.connector = redshift_connector
+    def __init__(self, connector: BaseConnector, snapshot_cache: Optional[SnapshotCache] = None,
+                 hooks: Optional[List[StatsHook]] = None, text_matcher: str = 'ratio'):
+        if text_matcher not in self.TEXT_MATCHERS:
+            raise ValueError(f"text_matcher must be one of {', '.join(self.TEXT_MATCHERS)}")
+        self.connector = connector
+        # Matcher used for name and address columns, in scoring and default blocking
+        self.text_matcher = text_matcher
+        self.snapshot_cache = snapshot_cache
+        # Receivers of the stage timings and run metrics
+        self.hooks = list(hooks or [])
+        # Stage timings and counters of the last run
+        self.last_run_stats = None
+        # Blocking counts of the last run, exposes the reduction ratio
+        self.last_blocking_report = None
+        # Comparisons executed and pruned during the last run
+        self.last_scoring_counters = None
+        # Comparison plan of the last run
+        self.last_plan = None
+        # Cost estimate checked against the budget before the last run
+        self.last_estimate = None
+        # Progress of the current run, if the caller follows it
+        self.progress = None
         
     def categorize_column(self, column_name: str) -> str:
         """Categorize column based on its name"""
@@ -55,81 +107,481 @@ class UniqueIdentifier:
         """Get weight for column category"""
         return self.COLUMN_CATEGORIES.get(category, {'weight': 0.2})['weight']
     
-    def compare_values(self, val1, val2, column_type: str) -> float:
-        """Compare two values using appropriate comparison method"""
-        if pd.isna(val1) or pd.isna(val2):
-            return 0.0
-            
-        val1, val2 = str(val1).lower(), str(val2).lower()
+    def get_columns_metadata(self, schema: str, table: str, columns: List[str]) -> List[ColumnMetadata]:
+        """Get type and category of the selected columns"""
+        column_types = {c["name"]: c["type"] for c in self.connector.get_columns(schema, table)}
+        return [ColumnMetadata(
+            name=col,
+            type=column_types[col],
+            category=self.categorize_column(col)
+        ) for col in columns]
+    
+    def get_scorer(self, column: ColumnMetadata) -> str:
+        """Scorer of a column: 'tfidf' for names and addresses when selected, 'ratio' otherwise"""
+        is_text = column.category == 'name' or (
+            column.category == 'contact' and contact_kind(column.name) == 'address'
+        )
+        return self.text_matcher if is_text else 'ratio'
+    
+    def get_column_pairs(self, columns1_meta: List[ColumnMetadata],
+                         columns2_meta: List[ColumnMetadata]) -> List[ColumnPair]:
+        """Get the column pairs compared during scoring
         
-        # Direct comparison for exact matches
-        if val1 == val2:
-            return 100.0
-            
-        # Fuzzy matching for text values
-        return fuzz.ratio(val1, val2)
+        Columns are paired within the same category, excluding 'other'. Contact
+        columns are only paired with the same kind (email, phone, address). With the
+        'tfidf' text matcher, name and address pairs are scored by TF-IDF similarity.
+        """
+        return [
+            ColumnPair(col1.name, col2.name, self.get_column_weight(col1.category), self.get_scorer(col1))
+            for col1 in columns1_meta
+            for col2 in columns2_meta
+            if col1.category == col2.category and col1.category != 'other'
+            and (col1.category != 'contact' or contact_kind(col1.name) == contact_kind(col2.name))
+        ]
+    
+    def compile_plan(self, columns1_meta: List[ColumnMetadata], columns2_meta: List[ColumnMetadata],
+                     values2: Dict[str, np.ndarray]) -> ComparisonPlan:
+        """Compile the column metadata into the ordered plan used for scoring"""
+        self.last_plan = ComparisonPlan.compile(self.get_column_pairs(columns1_meta, columns2_meta), values2)
+        return self.last_plan
+    
+    def begin_run(self, progress: Optional[RunProgress] = None):
+        """Start collecting the progress, timings and counters of a new run
+
+        Runs composed outside this class (e.g. IncrementalMatcher) call begin_run,
+        time their steps with stage() and end with finish_run.
+        """
+        self.progress = progress
+        self.last_run_stats = RunStats(hooks=self.hooks)
+        self.last_blocking_report = BlockingReport()
+        self.last_scoring_counters = ScoringCounters()
+    
+    def finish_run(self, matches: int):
+        """Complete the run metrics and notify the hooks"""
+        self.last_run_stats.finish(self.last_blocking_report, self.last_scoring_counters, matches)
+        self._set_stage('done')
+    
+    def _set_stage(self, stage: str):
+        """Report the current stage, stopping here if the run was cancelled"""
+        if self.progress is not None:
+            self.progress.set_stage(stage)
+    
+    @contextmanager
+    def stage(self, stage: str):
+        """Report the stage to the progress and time the enclosed block in the run stats"""
+        self._set_stage(stage)
+        if self.last_run_stats is None:
+            yield
+            return
+        with self.last_run_stats.stage(stage):
+            yield
+    
+    def _timed(self, chunks: Iterator[pd.DataFrame], stage: str) -> Iterator[pd.DataFrame]:
+        """Time the production of every chunk of a lazy iterator as a stage"""
+        iterator = iter(chunks)
+        while True:
+            with self.stage(stage):
+                chunk = next(iterator, None)
+            if chunk is None:
+                return
+            yield chunk
     
     def find_unique_users(self, schema1: str, table1: str, columns1: List[str],
-                         schema2: str, table2: str, columns2: List[str]) -> pd.DataFrame:
-        """Find unique users across two tables"""
-        # Fetch data from both tables
-        query1 = f"SELECT {', '.join(columns1)} FROM {schema1}.{table1}"
-        query2 = f"SELECT {', '.join(columns2)} FROM {schema2}.{table2}"
-        
-        with self.connector.connection.cursor() as cursor:
-            # Fetch data from first table
-            cursor.execute(query1)
-            data1 = cursor.fetchall()
-            df1 = pd.DataFrame(data1, columns=columns1)
-            
-            # Fetch data from second table
-            cursor.execute(query2)
-            data2 = cursor.fetchall()
-            df2 = pd.DataFrame(data2, columns=columns2)
+                         schema2: str, table2: str, columns2: List[str],
+                         blocker: Optional[Blocker] = None, workers: int = 1,
+                         chunk_size: Optional[int] = None, key1: Optional[str] = None,
+                         key2: Optional[str] = None, pushdown: bool = False,
+                         column_scores: bool = False, progress: Optional[RunProgress] = None,
+                         top_k: Optional[int] = None, one_to_one: bool = False,
+                         budget: Optional[RunBudget] = None) -> MatchResult:
+        """Find unique users across two tables
+
+        Only the candidate pairs emitted by the blocking stage are scored; without a
+        blocker, default rules are derived from the column categories. The optional
+        arguments are described in docs/model.md ("Arguments").
+        """
+        if pushdown and not (key1 and key2):
+            raise ValueError("pushdown requires key1 and key2")
+        if top_k is not None and top_k < 1:
+            raise ValueError("top_k must be at least 1")
+        if one_to_one and top_k is None:
+            top_k = self.ONE_TO_ONE_CANDIDATES
+        if pushdown and not self.connector.supports_pushdown:
+            raise ValueError(f"{type(self.connector).__name__} does not support pushdown")
+        self.begin_run(progress)
         
         # Get column metadata
-        columns1_meta = [ColumnMetadata(
-            name=col,
-            type=next(c["type"] for c in self.connector.get_columns(schema1, table1) if c["name"] == col),
-            category=self.categorize_column(col)
-        ) for col in columns1]
+        with self.stage('metadata'):
+            columns1_meta = self.get_columns_metadata(schema1, table1, columns1)
+            columns2_meta = self.get_columns_metadata(schema2, table2, columns2)
         
-        columns2_meta = [ColumnMetadata(
-            name=col,
-            type=next(c["type"] for c in self.connector.get_columns(schema2, table2) if c["name"] == col),
-            category=self.categorize_column(col)
-        ) for col in columns2]
-        
-        # Results storage
-        matches = []
-        
-        # Compare records
-        for idx1, row1 in df1.iterrows():
-            for idx2, row2 in df2.iterrows():
-                total_weight = 0
-                weighted_similarity = 0
-                
-                # Compare each column pair
-                for col1 in columns1_meta:
-                    for col2 in columns2_meta:
-                        if col1.category == col2.category and col1.category != 'other':
-                            weight = self.get_column_weight(col1.category)
-                            similarity = self.compare_values(row1[col1.name], row2[col2.name], col1.type)
-                            
-                            if similarity >= self.SIMILARITY_THRESHOLD:
-                                weighted_similarity += similarity * weight
-                                total_weight += weight
-                
-                # Calculate final similarity score
-                if total_weight > 0:
-                    final_score = weighted_similarity / total_weight
-                    if final_score >= self.SIMILARITY_THRESHOLD:
-                        matches.append({
-                            'table1_id': idx1,
-                            'table2_id': idx2,
-                            'similarity_score': final_score,
-                            **{f"table1_{col}": row1[col] for col in columns1},
-                            **{f"table2_{col}": row2[col] for col in columns2}
-                        })
-        
-        return pd.DataFrame(matches) 
\ No newline at end of file
+        if blocker is None:
+            blocker = Blocker.from_columns(columns1_meta, columns2_meta, text_matcher=self.text_matcher)
+        
+        if budget is not None:
+            with self.stage('estimate'):
+                self.last_estimate = self.estimate_run(schema1, table1, columns1, schema2, table2, columns2,
+                                                       blocker=blocker, workers=workers, chunk_size=chunk_size,
+                                                       budget=budget)
+            if not self.last_estimate.within_budget:
+                message = f"Run over budget: {'; '.join(self.last_estimate.over_budget)}"
+                if budget.refuse:
+                    raise BudgetExceeded(message)
+                warnings.warn(message, RuntimeWarning)
+        
+        exact_matches, where1, where2 = None, None, None
+        if pushdown:
+            with self.stage('pushdown'):
+                exact_matches, where1, where2 = self._pushdown_exact_matches(
+                    schema1, table1, columns1_meta, key1, schema2, table2, columns2_meta, key2
+                )
+        
+        # The second table is held in memory and normalized once. Without chunk_size
+        # both tables are fetched concurrently, each on its own pooled connection
+        if chunk_size:
+            df2 = self._fetch_table(schema2, table2, columns2_meta, chunk_size, key2, where2)
+            chunks1 = self._fetch_chunks(schema1, table1, columns1_meta, chunk_size, key1, where1)
+        else:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                future1 = executor.submit(self._fetch_table, schema1, table1, columns1_meta, None, key1, where1)
+                future2 = executor.submit(self._fetch_table, schema2, table2, columns2_meta, None, key2, where2)
+                chunks1, df2 = [future1.result()], future2.result()
+        with self.stage('plan'):
+            values2 = normalized_values(df2)
+            plan = self.compile_plan(columns1_meta, columns2_meta, values2)
+            columns2 = DistinctColumns.of_plan(values2, plan, 2)
+        
+        # Block keys of the second table are computed once for every chunk of the first
+        with self.stage('blocking'):
+            keys2 = blocker.block_keys(df2, 2)
+        
+        # One pool (and copy of the second table in shared memory) scores every chunk
+        results = []
+        offset = 0
+        with ScoringPool(values2, plan, workers, columns2) as pool:
+            for df1 in chunks1:
+                if key1 is None:
+                    df1.index = pd.RangeIndex(offset, offset + len(df1))
+                    offset += len(df1)
+                results.append(self.match_chunk(df1, df2, blocker, pool, keys2=keys2,
+                                                 column_scores=column_scores, top_k=top_k))
+            
+            if not results:
+                empty1 = add_normalized_columns(pd.DataFrame(columns=columns1), columns1_meta)
+                results.append(self.match_chunk(empty1, df2, blocker, pool, keys2=keys2,
+                                                 column_scores=column_scores, top_k=top_k))
+        
+        with self.stage('results'):
+            matches = MatchResult.concat(results)
+            if exact_matches is not None:
+                matches.match_type = np.full(len(matches), 'fuzzy', dtype=object)
+                exact_matches.records1 = matches.records1.iloc[:0]
+                exact_matches.records2 = matches.records2.iloc[:0]
+                matches = MatchResult.concat([exact_matches, matches])
+            if one_to_one:
+                matches = matches.one_to_one()
+        
+        self.finish_run(len(matches))
+        matches.stats = self.last_run_stats
+        return matches
+    
+    def estimate_run(self, schema1: str, table1: str, columns1: List[str],
+                     schema2: str, table2: str, columns2: List[str],
+                     blocker: Optional[Blocker] = None, workers: int = 1,
+                     chunk_size: Optional[int] = None, sample_size: int = DEFAULT_SAMPLE_SIZE,
+                     budget: Optional[RunBudget] = None) -> RunEstimate:
+        """Estimate the cost of find_unique_users with the same arguments, without running it
+
+        Both tables are counted and sampled (sample_size rows each); candidate pairs,
+        runtime per stage, peak memory and matches are extrapolated from the samples,
+        and blocking keys are recommended from the column categories. With a budget,
+        the limits it exceeds are listed in over_budget.
+        """
+        return CostEstimator(self, sample_size).estimate(
+            schema1, table1, columns1, schema2, table2, columns2,
+            blocker=blocker, workers=workers, chunk_size=chunk_size, budget=budget
+        )
+    
+    def deduplicate(self, schema: str, table: str, columns: List[str],
+                    blocker: Optional[Blocker] = None, workers: int = 1,
+                    key: Optional[str] = None, progress: Optional[RunProgress] = None) -> pd.DataFrame:
+        """Find duplicate users inside a single table and group them into clusters
+        
+        Each unordered pair of records is scored at most once. Accepted pairs are
+        merged with a union-find, so records linked through a chain of matches end
+        up in the same cluster. Returns one row per source row with its record_id
+        (key value, or row position without a key) and cluster_id.
+        """
+        self.begin_run(progress)
+        with self.stage('metadata'):
+            columns_meta = self.get_columns_metadata(schema, table, columns)
+        if blocker is None:
+            blocker = Blocker.from_columns(columns_meta, columns_meta, text_matcher=self.text_matcher)
+        
+        df = self._fetch_table(schema, table, columns_meta, key=key)
+        clusters = pd.DataFrame({
+            'record_id': df.index.to_numpy(),
+            'cluster_id': self._cluster(df, columns_meta, blocker, workers)
+        })
+        self.finish_run(len(clusters))
+        return clusters
+    
+    def canonical_columns(self, columns_meta: List[ColumnMetadata]) -> Dict[str, str]:
+        """Map the comparable columns of a table to the shared column names of the identity index
+        
+        Columns are named after their category (identity, name) or contact kind
+        (email, phone, address), numbered when a table has several of them
+        (name, name_2, ...). 'other' columns are never compared and are left out.
+        """
+        mapping, seen = {}, {}
+        for col in columns_meta:
+            if col.category == 'other':
+                continue
+            field = (contact_kind(col.name) or 'address') if col.category == 'contact' else col.category
+            seen[field] = seen.get(field, 0) + 1
+            mapping[col.name] = field if seen[field] == 1 else f"{field}_{seen[field]}"
+        return mapping
+    
+    def resolve_sources(self, sources: List[SourceTable], blocker: Optional[Blocker] = None,
+                        workers: int = 1, progress: Optional[RunProgress] = None) -> pd.DataFrame:
+        """Resolve any number of tables into one unified customer ID per source row
+        
+        The normalized records of every source are inserted into one shared identity
+        index (see canonical_columns), which is blocked and scored once like a single
+        table in deduplicate, so the cost grows with the total number of records
+        rather than with the number of table pairs. Duplicates within a source are
+        resolved as well. Returns the source ('schema.table'), record_id (key value,
+        or row position without a key) and customer_id of every row.
+        """
+        if not sources:
+            raise ValueError("resolve_sources requires at least one source")
+        self.begin_run(progress)
+        
+        with self.stage('metadata'):
+            sources_meta = [self.get_columns_metadata(source.schema, source.table, source.columns)
+                            for source in sources]
+        mappings = [self.canonical_columns(columns_meta) for columns_meta in sources_meta]
+        
+        # Shared columns of the index, with the type of the first source providing them
+        index_types = {}
+        for columns_meta, mapping in zip(sources_meta, mappings):
+            for col in columns_meta:
+                if col.name in mapping:
+                    index_types.setdefault(mapping[col.name], col.type)
+        index_meta = [ColumnMetadata(name, column_type, self.categorize_column(name))
+                      for name, column_type in index_types.items()]
+        if blocker is None:
+            blocker = Blocker.from_columns(index_meta, index_meta, text_matcher=self.text_matcher)
+        
+        # Sources are fetched concurrently, each on its own pooled connection
+        with ThreadPoolExecutor(max_workers=max(1, min(len(sources), 4))) as executor:
+            frames = list(executor.map(
+                lambda args: self._fetch_table(args[0].schema, args[0].table, args[1], key=args[0].key),
+                zip(sources, sources_meta)
+            ))
+        
+        parts = []
+        for frame, mapping in zip(frames, mappings):
+            renamed = {**mapping, **{f"{NORMALIZED_PREFIX}{col}": f"{NORMALIZED_PREFIX}{name}"
+                                     for col, name in mapping.items()}}
+            parts.append(frame[list(renamed)].rename(columns=renamed))
+        index = pd.concat(parts, ignore_index=True).reindex(
+            columns=[*index_types, *[f"{NORMALIZED_PREFIX}{name}" for name in index_types]]
+        )
+        
+        resolved = pd.DataFrame({
+            'source': np.repeat([f"{source.schema}.{source.table}" for source in sources],
+                                [len(frame) for frame in frames]),
+            'record_id': np.concatenate([frame.index.to_numpy(dtype=object) for frame in frames]),
+            'customer_id': self._cluster(index, index_meta, blocker, workers)
+        })
+        self.finish_run(len(resolved))
+        return resolved
+    
+    def _cluster(self, df: pd.DataFrame, columns_meta: List[ColumnMetadata],
+                 blocker: Blocker, workers: int) -> np.ndarray:
+        """Score every unordered candidate pair of a table once and return the cluster id of every row"""
+        with self.stage('plan'):
+            values = normalized_values(df)
+            plan = self.compile_plan(columns_meta, columns_meta, values)
+        
+        # Without blocking rules the candidate pairs come in batches of rows
+        clusters = UnionFind(len(df))
+        with ScoringPool(values, plan, workers) as pool:
+            for candidates in self._timed(blocker.candidate_batches_within(df), 'blocking'):
+                self.last_blocking_report.add(candidates)
+                if self.progress is not None:
+                    self.progress.add_total(len(candidates))
+                with self.stage('scoring'):
+                    left, right, _, _ = self._score_candidates(values, candidates, pool)
+                with self.stage('clustering'):
+                    clusters.union(left, right)
+        
+        with self.stage('clustering'):
+            return clusters.components()
+    
+    def _pushdown_exact_matches(self, schema1: str, table1: str, columns1_meta: List[ColumnMetadata], key1: str,
+                                schema2: str, table2: str, columns2_meta: List[ColumnMetadata], key2: str
+                                ) -> Tuple[Optional[MatchResult], Optional[str], Optional[str]]:
+        """Join both tables on normalized identity and email columns in the warehouse
+        
+        Returns the exact matches (keys only, scored 100) and the WHERE clauses that
+        select the rows of each table without an exact match.
+        """
+        exact_pairs = []
+        for pair in self.get_column_pairs(columns1_meta, columns2_meta):
+            category = self.categorize_column(pair.column1)
+            if category == 'identity':
+                exact_pairs.append((pair.column1, pair.column2, 'identity'))
+            elif category == 'contact' and contact_kind(pair.column1) == 'email':
+                exact_pairs.append((pair.column1, pair.column2, 'email'))
+        
+        if not exact_pairs:
+            return None, None, None
+        
+        key_pairs = self.connector.find_exact_matches(schema1, table1, key1, schema2, table2, key2, exact_pairs)
+        # The rows of exact matches are never fetched, so they carry no source columns
+        exact_matches = MatchResult(
+            key_pairs['table1_id'].to_numpy(), key_pairs['table2_id'].to_numpy(),
+            np.full(len(key_pairs), 100.0), pd.DataFrame(), pd.DataFrame(),
+            match_type=np.full(len(key_pairs), 'exact_pushdown', dtype=object)
+        )
+        where1 = self.connector.exact_match_residual_filter(schema1, table1, schema2, table2, exact_pairs)
+        where2 = self.connector.exact_match_residual_filter(
+            schema2, table2, schema1, table1, [(column2, column1, kind) for column1, column2, kind in exact_pairs]
+        )
+        return exact_matches, where1, where2
+    
+    def _fetch_table(self, schema: str, table: str, columns_meta: List[ColumnMetadata],
+                     chunk_size: Optional[int] = None, key: Optional[str] = None,
+                     where: Optional[str] = None) -> pd.DataFrame:
+        """Fetch a whole table with its normalized columns, batch by batch
+
+        The frame is assembled one column at a time, and the chunks of a column are
+        released once it is built, so the table is not held twice (chunks and frame).
+        """
+        chunks = list(self._fetch_chunks(schema, table, columns_meta, chunk_size, key, where))
+        if not chunks:
+            empty = add_normalized_columns(pd.DataFrame(columns=[col.name for col in columns_meta]), columns_meta)
+            return empty.rename_axis(key)
+        if len(chunks) == 1:
+            return chunks[0]
+        
+        if key is None:
+            index = pd.RangeIndex(sum(len(chunk) for chunk in chunks))
+        else:
+            index = chunks[0].index.append([chunk.index for chunk in chunks[1:]])
+        data = {
+            name: pd.concat([chunk.pop(name) for chunk in chunks], ignore_index=True).array
+            for name in list(chunks[0].columns)
+        }
+        return pd.DataFrame(data, index=index, copy=False)
+    
+    def _fetch_chunks(self, schema: str, table: str, columns_meta: List[ColumnMetadata],
+                      chunk_size: Optional[int] = None, key: Optional[str] = None,
+                      where: Optional[str] = None) -> Iterator[pd.DataFrame]:
+        """Stream a table with its normalized columns, indexed by the key column when given
+        
+        Reads from the snapshot cache when possible, otherwise from the warehouse. The
+        normalized columns are cached with the data, so they are computed only once.
+        """
+        columns = [col.name for col in columns_meta]
+        fetch_columns = list(dict.fromkeys([key, *columns])) if key else columns
+        fetched = self._timed(
+            self.connector.fetch_table_chunks(schema, table, fetch_columns, chunk_size, where), 'fetch'
+        )
+        chunks = (self._normalize_chunk(chunk, columns_meta) for chunk in fetched)
+        if self.snapshot_cache is not None:
+            chunks = self._cached_chunks(schema, table, columns_meta, chunk_size, key, where, chunks)
+        
+        for chunk in chunks:
+            yield chunk.set_index(key, drop=key not in columns) if key else chunk
+    
+    def _normalize_chunk(self, chunk: pd.DataFrame, columns_meta: List[ColumnMetadata]) -> pd.DataFrame:
+        """Count a chunk fetched from the source and add its normalized columns"""
+        if self.last_run_stats is not None:
+            self.last_run_stats.add_fetched(chunk)
+        with self.stage('normalize'):
+            return add_normalized_columns(chunk, columns_meta)
+    
+    def _cached_chunks(self, schema: str, table: str, columns_meta: List[ColumnMetadata],
+                       chunk_size: Optional[int], key: Optional[str], where: Optional[str],
+                       chunks: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """Serve chunks from the snapshot cache, or write the fetched chunks through it"""
+        cache = self.snapshot_cache
+        cache_key = cache.make_key(
+            self.connector.host, self.connector.database, schema, table,
+            [f"{col.name}:{col.category}" for col in columns_meta],
+            cache.freshness_marker(self.connector, schema, table),
+            variant=f"normalized-v{NORMALIZATION_VERSION}|key={key}|where={where}"
+        )
+        cached = cache.get_chunks(cache_key, chunk_size)
+        if cached is not None:
+            for chunk in self._timed(cached, 'cache_read'):
+                if self.last_run_stats is not None:
+                    self.last_run_stats.add_fetched(chunk, from_cache=True)
+                yield chunk
+        else:
+            yield from cache.write_through(cache_key, chunks)
+    
+    def match_chunk(self, df1: pd.DataFrame, df2: pd.DataFrame, blocker: Blocker, pool: ScoringPool,
+                     keys1: Optional[pd.DataFrame] = None, keys2: Optional[pd.DataFrame] = None,
+                     column_scores: bool = False, top_k: Optional[int] = None) -> MatchResult:
+        """Block and score one chunk of the first table against the second table
+
+        The DataFrame indexes are used as table1_id / table2_id in the results. Only
+        the matched rows of the chunk are kept as records. pool holds the plan and the
+        second table, factorized once for every chunk.
+        """
+        # Blocking stage: generate candidate pairs instead of the full cross product. Without
+        # rules they come in batches of left rows, each scored before the next one is built
+        values1 = normalized_values(df1)
+        scored = []
+        for candidates in self._timed(blocker.candidate_batches(df1, df2, keys1, keys2), 'blocking'):
+            self.last_blocking_report.add(candidates)
+            if self.progress is not None:
+                self.progress.add_total(len(candidates))
+            
+            # Score all candidate pairs as arrays on the normalized values
+            with self.stage('scoring'):
+                scored.append(self._score_candidates(values1, candidates, pool, column_scores, top_k))
+        
+        with self.stage('results'):
+            if len(scored) == 1:
+                left, right, scores, step_scores = scored[0]
+            else:
+                lefts, rights, batch_scores, batch_step_scores = zip(*scored)
+                left, right, scores = np.concatenate(lefts), np.concatenate(rights), np.concatenate(batch_scores)
+                step_scores = np.concatenate(batch_step_scores, axis=1) if column_scores else None
+            return self._chunk_result(df1, df2, left, right, scores, pool.plan, step_scores)
+    
+    def _chunk_result(self, df1: pd.DataFrame, df2: pd.DataFrame, left: np.ndarray, right: np.ndarray,
+                      scores: np.ndarray, plan: ComparisonPlan, step_scores: Optional[np.ndarray]) -> MatchResult:
+        """Matches of one chunk, keeping only its matched rows as records"""
+        return MatchResult(
+            df1.index.to_numpy()[left],
+            df2.index.to_numpy()[right],
+            scores,
+            df1[raw_columns(df1)].iloc[np.unique(left)],
+            df2[raw_columns(df2)],
+            column_scores={
+                f"score_{pair.column1}_{pair.column2}": step_scores[step]
+                for step, pair in enumerate(plan.steps)
+            } if step_scores is not None else None
+        )
+    
+    def _score_candidates(self, values1: Dict[str, np.ndarray], candidates: CandidatePairs, pool: ScoringPool,
+                          column_scores: bool = False, top_k: Optional[int] = None
+                          ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        """Score candidate pairs against the table of the pool, in its processes when there are enough of them"""
+        if pool.workers > 1 and len(candidates) >= self.PARALLEL_MIN_PAIRS:
+            return pool.score(
+                values1, candidates.left, candidates.right, self.SIMILARITY_THRESHOLD,
+                counters=self.last_scoring_counters, column_scores=column_scores,
+                progress=self.progress, top_k=top_k
+            )
+        return score_candidates(
+            values1, None, candidates.left, candidates.right,
+            pool.plan, self.SIMILARITY_THRESHOLD, counters=self.last_scoring_counters,
+            column_scores=column_scores, progress=self.progress, top_k=top_k, columns2=pool.columns2
+        )
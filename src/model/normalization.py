@@ -0,0 +1,138 @@
+import pandas as pd
+import numpy as np
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from src.model.model_run import ColumnMetadata
+
+# Bump when a normalizer changes, so cached normalized columns are rebuilt
+NORMALIZATION_VERSION = 1
+
+# Normalized copies of the selected columns are stored next to them under this prefix
+NORMALIZED_PREFIX = '__normalized__'
+
+# Column name patterns used to tell apart the different kinds of 'contact' columns
+CONTACT_KINDS = {
+    'email': ['email', 'e_mail'],
+    'phone': ['phone', 'mobile', 'telephone', 'contact_number'],
+    'address': ['address', 'postal_code', 'zip_code'],
+}
+
+# Honorifics and suffixes dropped from names
+NAME_TITLES = {
+    'mr', 'mrs', 'ms', 'miss', 'mx', 'dr', 'prof', 'sir', 'jr', 'sr',
+    'md', 'phd', 'dds', 'dvm', 'ii', 'iii', 'iv'
+}
+
+
+def contact_kind(column_name: str) -> Optional[str]:
+    """Return the kind of contact column (email, phone, address) based on its name"""
+    column_name = column_name.lower()
+    for kind, patterns in CONTACT_KINDS.items():
+        if any(pattern in column_name for pattern in patterns):
+            return kind
+    return None
+
+
+def _as_text(values: pd.Series) -> pd.Series:
+    # Arrow-backed columns (e.g. from the file connectors) stay in Arrow memory
+    if isinstance(values.dtype, pd.ArrowDtype):
+        return values.astype(pd.StringDtype('pyarrow'))
+    return values.astype('string')
+
+
+def _fold_accents(values: pd.Series) -> pd.Series:
+    return values.str.normalize('NFKD').str.encode('ascii', errors='ignore').str.decode('ascii').astype('string')
+
+
+def _blank_to_na(values: pd.Series) -> pd.Series:
+    return values.where(values.str.len() > 0)
+
+
+def normalize_phone(values: pd.Series, country_code: str = '1') -> pd.Series:
+    """Digits only, without the international prefix and the default country code"""
+    digits = _as_text(values).str.replace(r'\D', '', regex=True).str.replace(r'^00', '', regex=True)
+    has_country_code = digits.str.startswith(country_code) & (digits.str.len() == 10 + len(country_code))
+    digits = digits.where(~has_country_code, digits.str[len(country_code):])
+    return _blank_to_na(digits)
+
+
+def normalize_email(values: pd.Series) -> pd.Series:
+    """Lowercase emails, undo '(at)'-style obfuscation and drop '+tags' from the local part"""
+    emails = _as_text(values).str.strip().str.lower().str.replace(r'^mailto:', '', regex=True)
+    obfuscated = ~emails.str.contains('@', regex=False).fillna(False)
+    emails = emails.where(~obfuscated, emails.str.replace(
+        r'\s*(?:\.at\.|\(at\)|\[at\]|\s+at\s+)\s*', '@', n=1, regex=True
+    ))
+    emails = emails.str.replace(r'\+[^@]*@', '@', regex=True).str.replace(r'\s+', '', regex=True)
+    return _blank_to_na(emails)
+
+
+def normalize_name(values: pd.Series) -> pd.Series:
+    """Accent-folded, lowercase name tokens without titles, sorted so word order does not matter"""
+    names = _fold_accents(_as_text(values)).str.lower()
+    names = names.str.replace(r"['`]", '', regex=True).str.replace(r'[^a-z0-9]+', ' ', regex=True)
+
+    # Sorting tokens is done once per distinct name
+    codes, uniques = pd.factorize(names)
+    sorted_names = np.array([
+        ' '.join(sorted(token for token in name.split() if token not in NAME_TITLES))
+        for name in uniques
+    ], dtype=object)
+    result = sorted_names[codes] if len(sorted_names) else np.full(len(codes), None, dtype=object)
+    result[codes < 0] = None
+    return _blank_to_na(pd.Series(result, index=values.index, dtype='string'))
+
+
+def normalize_address(values: pd.Series) -> pd.Series:
+    """Accent-folded lowercase address with punctuation removed and whitespace collapsed"""
+    addresses = _fold_accents(_as_text(values)).str.lower()
+    addresses = addresses.str.replace(r'[^a-z0-9]+', ' ', regex=True).str.strip()
+    return _blank_to_na(addresses)
+
+
+def normalize_identifier(values: pd.Series) -> pd.Series:
+    """Document numbers compared on letters and digits only"""
+    return _blank_to_na(_as_text(values).str.lower().str.replace(r'[^0-9a-z]', '', regex=True))
+
+
+def normalize_text(values: pd.Series) -> pd.Series:
+    """Default normalization: lowercase, trimmed, whitespace collapsed"""
+    return _blank_to_na(_as_text(values).str.strip().str.lower().str.replace(r'\s+', ' ', regex=True))
+
+
+def normalize_column(values: pd.Series, category: str, column_name: str) -> pd.Series:
+    """Normalize a whole column according to its category (and kind, for contact columns)"""
+    if category == 'identity':
+        return normalize_identifier(values)
+    if category == 'name':
+        return normalize_name(values)
+    if category == 'contact':
+        kind = contact_kind(column_name)
+        if kind == 'email':
+            return normalize_email(values)
+        if kind == 'phone':
+            return normalize_phone(values)
+        return normalize_address(values)
+    return normalize_text(values)
+
+
+def add_normalized_columns(df: pd.DataFrame, columns_meta: List['ColumnMetadata']) -> pd.DataFrame:
+    """Add the normalized copy of every selected column next to the raw data"""
+    return df.assign(**{
+        f"{NORMALIZED_PREFIX}{col.name}": normalize_column(df[col.name], col.category, col.name)
+        for col in columns_meta
+    })
+
+
+def raw_columns(df: pd.DataFrame) -> List[str]:
+    """Columns of a frame, without the normalized copies"""
+    return [col for col in df.columns if not col.startswith(NORMALIZED_PREFIX)]
+
+
+def normalized_values(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Normalized values of every selected column as arrays of strings (None when missing)"""
+    return {
+        col: df[f"{NORMALIZED_PREFIX}{col}"].to_numpy(dtype=object, na_value=None)
+        for col in raw_columns(df)
+    }
@@ -0,0 +1,242 @@
+import multiprocessing as mp
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Optional, Tuple
+from src.model.scoring import ComparisonPlan, DistinctColumns, ScoringCounters, score_candidates
+from src.model.progress import RunProgress
+
+# Shards per worker, a few more than workers keeps the pool busy when shards are uneven
+SHARDS_PER_WORKER = 4
+
+# Plan and factorized right-side columns read from shared memory, set once per worker process
+_plan = None
+_right_columns = None
+_right_memory = None
+
+
+def _align(position: int) -> int:
+    return (position + 7) // 8 * 8
+
+
+def share_columns(values: Dict[str, np.ndarray]) -> Tuple[SharedMemory, Dict[str, dict]]:
+    """Copy normalized columns into one shared memory block (UTF-8 data, offsets and null mask)
+
+    Returns the block and the layout workers need to decode it.
+    """
+    encoded_columns = {}
+    layout = {}
+    position = 0
+    for name, column in values.items():
+        missing = pd.isna(column)
+        encoded = [b'' if is_missing else value.encode('utf-8') for value, is_missing in zip(column, missing)]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        data = b''.join(encoded)
+
+        layout[name] = {'rows': len(column), 'offsets': position}
+        position = _align(position + offsets.nbytes)
+        layout[name]['missing'] = position
+        position = _align(position + missing.nbytes)
+        layout[name]['data'] = (position, len(data))
+        position = _align(position + len(data))
+        encoded_columns[name] = (offsets, missing, data)
+
+    memory = SharedMemory(create=True, size=max(position, 1))
+    for name, (offsets, missing, data) in encoded_columns.items():
+        info = layout[name]
+        memory.buf[info['offsets']:info['offsets'] + offsets.nbytes] = offsets.tobytes()
+        memory.buf[info['missing']:info['missing'] + missing.nbytes] = missing.tobytes()
+        start, size = info['data']
+        memory.buf[start:start + size] = data
+    return memory, layout
+
+
+def share_arrays(arrays: Dict[str, np.ndarray]) -> Tuple[SharedMemory, Dict[str, tuple]]:
+    """Copy one-dimensional numeric arrays into one shared memory block
+
+    Returns the block and the layout (offset, length, dtype) of every array.
+    """
+    layout = {}
+    position = 0
+    for name, array in arrays.items():
+        layout[name] = (position, len(array), array.dtype.str)
+        position = _align(position + array.nbytes)
+
+    memory = SharedMemory(create=True, size=max(position, 1))
+    for name, array in arrays.items():
+        offset, length, dtype = layout[name]
+        np.ndarray((length,), dtype=dtype, buffer=memory.buf, offset=offset)[:] = array
+    return memory, layout
+
+
+def read_shared_arrays(memory: SharedMemory, layout: Dict[str, tuple]) -> Dict[str, np.ndarray]:
+    """Arrays written by share_arrays, as views of the shared block (no copy)"""
+    return {
+        name: np.ndarray((length,), dtype=dtype, buffer=memory.buf, offset=offset)
+        for name, (offset, length, dtype) in layout.items()
+    }
+
+
+def read_shared_columns(memory: SharedMemory, layout: Dict[str, dict]) -> Dict[str, np.ndarray]:
+    """Decode columns written by share_columns back into arrays of normalized values"""
+    values = {}
+    for name, info in layout.items():
+        rows = info['rows']
+        offsets = np.ndarray((rows + 1,), dtype=np.int64, buffer=memory.buf, offset=info['offsets'])
+        missing = np.ndarray((rows,), dtype=bool, buffer=memory.buf, offset=info['missing'])
+        start, size = info['data']
+        data = bytes(memory.buf[start:start + size])
+
+        column = np.empty(rows, dtype=object)
+        bounds = offsets.tolist()
+        for row in range(rows):
+            column[row] = None if missing[row] else data[bounds[row]:bounds[row + 1]].decode('utf-8')
+        values[name] = column
+    return values
+
+
+def _init_worker(values_name: str, values_layout: Dict[str, dict],
+                 arrays_name: str, arrays_layout: Dict[str, tuple], plan: ComparisonPlan):
+    """Attach to the shared right-side columns, already factorized, once per worker process"""
+    global _plan, _right_columns, _right_memory
+    _right_memory = (SharedMemory(name=values_name), SharedMemory(name=arrays_name))
+    distinct = read_shared_columns(_right_memory[0], values_layout)
+    arrays = read_shared_arrays(_right_memory[1], arrays_layout)
+    _plan = plan
+    _right_columns = DistinctColumns.from_arrays(
+        {column: arrays[f"codes:{column}"] for column in distinct},
+        distinct,
+        {column: arrays[f"lengths:{column}"] for column in distinct}
+    )
+
+
+def _score_shard(values1: Dict[str, np.ndarray], left: np.ndarray, right: np.ndarray,
+                 threshold: float, column_scores: bool, top_k: Optional[int]):
+    counters = ScoringCounters()
+    return score_candidates(values1, None, left, right, _plan, threshold, counters=counters,
+                            column_scores=column_scores, top_k=top_k, columns2=_right_columns), counters
+
+
+class ScoringPool:
+    """Process pool scoring candidate pairs against one right-side table, reused across calls
+
+    The right-side columns are factorized once (unless columns2 is given). With
+    workers > 1, on first use they are placed in shared memory and the workers
+    started; every chunk of a run is then scored by the same workers. close() stops
+    them and frees the shared memory.
+    """
+
+    def __init__(self, values2: Dict[str, np.ndarray], plan: ComparisonPlan, workers: int,
+                 columns2: Optional[DistinctColumns] = None):
+        self.values2 = values2
+        self.plan = plan
+        self.workers = workers
+        self._columns2 = columns2
+        self._memory = []
+        self._executor = None
+
+    def __enter__(self) -> 'ScoringPool':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def columns2(self) -> DistinctColumns:
+        """The right-side columns factorized for the plan, computed on first use"""
+        if self._columns2 is None:
+            self._columns2 = DistinctColumns.of_plan(self.values2, self.plan, 2)
+        return self._columns2
+
+    def _start(self):
+        columns2 = self.columns2
+        values_memory, values_layout = share_columns(columns2.distinct)
+        self._memory.append(values_memory)
+        arrays_memory, arrays_layout = share_arrays({
+            **{f"codes:{column}": codes for column, codes in columns2.codes.items()},
+            **{f"lengths:{column}": lengths for column, lengths in columns2.lengths.items()}
+        })
+        self._memory.append(arrays_memory)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=mp.get_context('spawn'), initializer=_init_worker,
+            initargs=(values_memory.name, values_layout, arrays_memory.name, arrays_layout, self.plan)
+        )
+
+    def score(self, values1: Dict[str, np.ndarray], left: np.ndarray, right: np.ndarray, threshold: float,
+              counters: Optional[ScoringCounters] = None, column_scores: bool = False,
+              progress: Optional[RunProgress] = None, top_k: Optional[int] = None
+              ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        """Score candidate pairs in the pool, sharding on left rows
+
+        Each task only carries the left rows of its shard. Shards are merged in order,
+        so the output is the same as score_candidates (top_k heaps are per left row,
+        so shards keep them whole). Progress is advanced as shards complete; if the
+        run is cancelled, shards that have not started are dropped.
+        """
+        counters = counters if counters is not None else ScoringCounters()
+        if len(left) == 0:
+            return self._score_empty(values1, left, right, threshold, counters, column_scores, top_k)
+        if self._executor is None:
+            self._start()
+
+        # Sorted by left index, shards become contiguous ranges of left rows
+        if np.any(left[1:] < left[:-1]):
+            order = np.argsort(left, kind='stable')
+            left, right = left[order], right[order]
+        row_bounds = np.unique(
+            np.linspace(left[0], left[-1] + 1, self.workers * SHARDS_PER_WORKER + 1).astype(np.int64)
+        )
+        pair_bounds = np.searchsorted(left, row_bounds)
+
+        futures = []
+        for shard in range(len(row_bounds) - 1):
+            start, end = pair_bounds[shard], pair_bounds[shard + 1]
+            if start == end:
+                continue
+            first_row, last_row = row_bounds[shard], row_bounds[shard + 1]
+            shard_values = {name: column[first_row:last_row] for name, column in values1.items()}
+            futures.append((first_row, end - start, self._executor.submit(
+                _score_shard, shard_values, left[start:end] - first_row, right[start:end],
+                threshold, column_scores, top_k
+            )))
+
+        results = []
+        try:
+            for first_row, shard_pairs, future in futures:
+                (shard_left, shard_right, shard_scores, shard_column_scores), shard_counters = future.result()
+                counters.add(shard_counters)
+                results.append((shard_left + first_row, shard_right, shard_scores, shard_column_scores))
+                if progress is not None:
+                    progress.advance(shard_pairs)
+        except BaseException:
+            for _, _, future in futures:
+                future.cancel()
+            raise
+
+        if not results:
+            return self._score_empty(values1, left, right, threshold, counters, column_scores, top_k)
+        shard_lefts, shard_rights, shard_scores, shard_column_scores = zip(*results)
+        return (
+            np.concatenate(shard_lefts), np.concatenate(shard_rights), np.concatenate(shard_scores),
+            np.concatenate(shard_column_scores, axis=1) if column_scores else None
+        )
+
+    def _score_empty(self, values1: Dict[str, np.ndarray], left: np.ndarray, right: np.ndarray,
+                     threshold: float, counters: ScoringCounters, column_scores: bool, top_k: Optional[int]
+                     ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        """Empty results with the layout of score_candidates"""
+        return score_candidates(values1, None, left[:0], right[:0], self.plan, threshold, counters=counters,
+                                column_scores=column_scores, top_k=top_k, columns2=self.columns2)
+
+    def close(self):
+        """Stop the workers and free the shared memory"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        for memory in self._memory:
+            memory.close()
+            memory.unlink()
+        self._memory = []
+
@@ -0,0 +1,50 @@
+import threading
+
+
+class MatchCancelled(Exception):
+    """Raised inside a run once its progress has been cancelled"""
+
+
+class RunProgress:
+    """Progress of a matching run, updated by the run and read from another thread
+
+    pairs_total is the number of candidate pairs blocked so far, so it grows while
+    the first table is streamed in chunks. Cancellation is cooperative: the run
+    checks it between stages and scoring batches and stops with MatchCancelled.
+    """
+
+    def __init__(self):
+        self.stage = 'pending'
+        self.pairs_scored = 0
+        self.pairs_total = 0
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    def set_stage(self, stage: str):
+        self.check()
+        self.stage = stage
+
+    def add_total(self, pairs: int):
+        with self._lock:
+            self.pairs_total += pairs
+
+    def advance(self, pairs: int):
+        """Count scored pairs, then stop the run if it was cancelled"""
+        with self._lock:
+            self.pairs_scored += pairs
+        self.check()
+
+    @property
+    def fraction(self) -> float:
+        return min(self.pairs_scored / self.pairs_total, 1.0) if self.pairs_total else 0.0
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def check(self):
+        if self._cancelled.is_set():
+            raise MatchCancelled("Matching run cancelled")
@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from typing import Dict, Iterator, List, Optional
+from src.connectors.file_connector import arrow_schema
+
+# Rows joined with their source columns at a time when exporting
+EXPORT_CHUNK_SIZE = 100_000
+
+
+class MatchResult:
+    """Matches held as compact parallel arrays, joined with their source rows on demand
+
+    table1_id / table2_id index records1 / records2, which hold the raw selected
+    columns of the matched rows. Scores are float32; column_scores optionally holds
+    the similarity of every compared column pair, keyed by its output column name.
+    Source columns are only looked up for the rows that are displayed or exported.
+    """
+
+    def __init__(self, table1_id: np.ndarray, table2_id: np.ndarray, scores: np.ndarray,
+                 records1: pd.DataFrame, records2: pd.DataFrame,
+                 column_scores: Optional[Dict[str, np.ndarray]] = None,
+                 match_type: Optional[np.ndarray] = None):
+        self.table1_id = np.asarray(table1_id)
+        self.table2_id = np.asarray(table2_id)
+        self.scores = np.asarray(scores, dtype=np.float32)
+        self.records1 = records1
+        self.records2 = records2
+        self.column_scores = column_scores
+        self.match_type = match_type
+        # RunStats of the run that produced the matches, set by UniqueIdentifier
+        self.stats = None
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    @property
+    def empty(self) -> bool:
+        return len(self) == 0
+
+    @classmethod
+    def concat(cls, results: List['MatchResult']) -> 'MatchResult':
+        """Combine results, e.g. of several chunks of the first table"""
+        def unique_records(frames: List[pd.DataFrame]) -> pd.DataFrame:
+            # Chunks matched against the same table share its records
+            distinct = list({id(frame): frame for frame in frames}.values())
+            if len(distinct) == 1:
+                return distinct[0]
+            records = pd.concat(distinct)
+            return records[~records.index.duplicated()]
+
+        column_scores = None
+        if any(result.column_scores is not None for result in results):
+            labels = list(dict.fromkeys(
+                label for result in results for label in (result.column_scores or {})
+            ))
+            # Matches without column scores (e.g. pushed down exact matches) get NaN
+            column_scores = {
+                label: np.concatenate([
+                    (result.column_scores or {}).get(label, np.full(len(result), np.nan, dtype=np.float32))
+                    for result in results
+                ])
+                for label in labels
+            }
+
+        match_type = None
+        if any(result.match_type is not None for result in results):
+            match_type = np.concatenate([
+                result.match_type if result.match_type is not None else np.full(len(result), None, dtype=object)
+                for result in results
+            ])
+
+        return cls(
+            np.concatenate([result.table1_id for result in results]),
+            np.concatenate([result.table2_id for result in results]),
+            np.concatenate([result.scores for result in results]),
+            unique_records([result.records1 for result in results]),
+            unique_records([result.records2 for result in results]),
+            column_scores=column_scores,
+            match_type=match_type
+        )
+
+    def select(self, positions: np.ndarray) -> 'MatchResult':
+        """Subset of the matches at the given positions, sharing the same records"""
+        result = MatchResult(
+            self.table1_id[positions], self.table2_id[positions], self.scores[positions],
+            self.records1, self.records2,
+            column_scores={label: scores[positions] for label, scores in self.column_scores.items()}
+            if self.column_scores is not None else None,
+            match_type=self.match_type[positions] if self.match_type is not None else None
+        )
+        result.stats = self.stats
+        return result
+
+    def one_to_one(self) -> 'MatchResult':
+        """Greedy one-to-one assignment: the best remaining match is taken while both records are free
+
+        Ties go to the lower table1_id, then table2_id. Matches are scanned once in
+        that order, keeping track of the records already used.
+        """
+        ranked = np.lexsort((self.table2_id, self.table1_id, -self.scores))
+        codes1, uniques1 = pd.factorize(self.table1_id[ranked])
+        codes2, uniques2 = pd.factorize(self.table2_id[ranked])
+        used1, used2 = [False] * len(uniques1), [False] * len(uniques2)
+        assigned = []
+        for position, code1, code2 in zip(ranked.tolist(), codes1.tolist(), codes2.tolist()):
+            if not used1[code1] and not used2[code2]:
+                used1[code1] = used2[code2] = True
+                assigned.append(position)
+        return self.select(np.sort(np.array(assigned, dtype=np.int64)))
+
+    def ids(self) -> pd.DataFrame:
+        """Matched ids and scores only, without the source columns"""
+        frame = pd.DataFrame({
+            'table1_id': self.table1_id,
+            'table2_id': self.table2_id,
+            'similarity_score': self.scores
+        })
+        if self.match_type is not None:
+            frame['match_type'] = self.match_type
+        return frame
+
+    def to_frame(self, start: int = 0, stop: Optional[int] = None) -> pd.DataFrame:
+        """Matches start..stop with the source columns of both rows joined in"""
+        stop = len(self) if stop is None else min(stop, len(self))
+        table1_id, table2_id = self.table1_id[start:stop], self.table2_id[start:stop]
+        rows1 = self.records1.reindex(table1_id)
+        rows2 = self.records2.reindex(table2_id)
+
+        frame = pd.DataFrame({
+            'table1_id': table1_id,
+            'table2_id': table2_id,
+            'similarity_score': self.scores[start:stop],
+            **{label: scores[start:stop] for label, scores in (self.column_scores or {}).items()},
+            **{f"table1_{col}": rows1[col].to_numpy() for col in rows1.columns},
+            **{f"table2_{col}": rows2[col].to_numpy() for col in rows2.columns}
+        })
+        if self.match_type is not None:
+            frame['match_type'] = self.match_type[start:stop]
+        return frame
+
+    def head(self, n: int = 5) -> pd.DataFrame:
+        return self.to_frame(0, n)
+
+    def iter_frames(self, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+        """Matches with their source columns, chunk_size rows at a time"""
+        for start in range(0, len(self), chunk_size):
+            yield self.to_frame(start, start + chunk_size)
+
+    def to_csv(self, path: str, chunk_size: int = EXPORT_CHUNK_SIZE):
+        """Stream the matches with their source columns to a CSV file"""
+        with open(path, 'w', newline='') as output_file:
+            self.to_frame(0, 0).to_csv(output_file, index=False)
+            for frame in self.iter_frames(chunk_size):
+                frame.to_csv(output_file, index=False, header=False)
+
+    def to_parquet(self, path: str, chunk_size: int = EXPORT_CHUNK_SIZE):
+        """Stream the matches with their source columns to a Parquet file, one row group per chunk"""
+        writer = None
+        schema = None
+        try:
+            for frame in self.iter_frames(chunk_size):
+                if writer is None:
+                    schema = arrow_schema(frame)
+                    writer = pq.ParquetWriter(path, schema)
+                writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+            if writer is None:
+                self.to_frame(0, 0).to_parquet(path, index=False)
+        finally:
+            if writer is not None:
+                writer.close()
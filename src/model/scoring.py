@@ -0,0 +1,472 @@
+import pandas as pd
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from rapidfuzz import fuzz
+from rapidfuzz.process import cdist, cpdist
+from src.model.progress import RunProgress
+from src.model.tfidf import NgramVectorizer, tfidf_scores
+
+# Number of candidate pairs scored per batch, bounds the size of temporary arrays
+DEFAULT_BATCH_SIZE = 1_000_000
+
+# Batch size bounds when keeping the top k pairs per row: smaller batches let score floors rise sooner
+TOP_K_BATCH_SIZE = 100_000
+TOP_K_MIN_BATCH_SIZE = 1_000
+
+# Scores of distinct value pairs remembered per plan step, across the batches of a call
+PAIR_CACHE_SIZE = 1_000_000
+
+
+@dataclass
+class ColumnPair:
+    """Two comparable columns (one from each table) and the weight of their category
+
+    scorer is 'ratio' (edit distance, fuzz.ratio) or 'tfidf' (character n-gram
+    TF-IDF cosine similarity).
+    """
+    column1: str
+    column2: str
+    weight: float
+    scorer: str = 'ratio'
+
+
+@dataclass
+class ScoringCounters:
+    """Work done (and avoided) while scoring candidate pairs"""
+    comparisons_executed: int = 0
+    comparisons_pruned: int = 0
+    comparisons_reused: int = 0
+    pairs_pruned: int = 0
+
+    def add(self, other: 'ScoringCounters'):
+        self.comparisons_executed += other.comparisons_executed
+        self.comparisons_pruned += other.comparisons_pruned
+        self.comparisons_reused += other.comparisons_reused
+        self.pairs_pruned += other.pairs_pruned
+
+
+@dataclass
+class ComparisonPlan:
+    """Column pairs to compare, in the order they are scored
+
+    vectorizers holds the n-gram vectorizer of every 'tfidf' step, fitted on the
+    values of the second table and keyed by (column1, column2).
+    """
+    steps: List[ColumnPair]
+    vectorizers: Dict[Tuple[str, str], NgramVectorizer] = field(default_factory=dict)
+
+    @classmethod
+    def compile(cls, column_pairs: List[ColumnPair], values2: Dict[str, np.ndarray]) -> 'ComparisonPlan':
+        """Order column pairs by weight, then by selectivity (share of distinct values)
+
+        Heavier and more selective columns come first, so pairs are accepted or
+        ruled out with as few comparisons as possible.
+        """
+        def selectivity(pair: ColumnPair) -> float:
+            values = pd.Series(values2[pair.column2]).dropna()
+            return values.nunique() / len(values) if len(values) else 0.0
+
+        vectorizers = {
+            (pair.column1, pair.column2): NgramVectorizer().fit(values2[pair.column2])
+            for pair in column_pairs if pair.scorer == 'tfidf'
+        }
+        return cls(sorted(column_pairs, key=lambda pair: (-pair.weight, -selectivity(pair))), vectorizers)
+
+
+def _lengths(values: np.ndarray) -> np.ndarray:
+    """Length of every value, -1 when missing"""
+    return np.fromiter((-1 if value is None else len(value) for value in values), dtype=np.int64, count=len(values))
+
+
+class DistinctColumns:
+    """Columns factorized into their distinct values and integer codes (-1 when missing)
+
+    Values are compared as distinct pairs, and the codes broadcast the scores back
+    to rows. lengths holds the length of every row's value (-1 when missing).
+    """
+
+    def __init__(self, values: Dict[str, np.ndarray], columns: List[str]):
+        self.codes, self.distinct, self.lengths = {}, {}, {}
+        for column in columns:
+            codes, distinct = pd.factorize(values[column], use_na_sentinel=True)
+            self.codes[column] = codes.astype(np.int64, copy=False)
+            self.distinct[column] = np.asarray(distinct, dtype=object)
+            # Code -1 picks the trailing -1
+            self.lengths[column] = np.append(_lengths(self.distinct[column]), -1)[codes]
+
+    @classmethod
+    def from_arrays(cls, codes: Dict[str, np.ndarray], distinct: Dict[str, np.ndarray],
+                    lengths: Dict[str, np.ndarray]) -> 'DistinctColumns':
+        """Columns factorized elsewhere, e.g. by another process"""
+        columns = cls.__new__(cls)
+        columns.codes, columns.distinct, columns.lengths = codes, distinct, lengths
+        return columns
+
+    @classmethod
+    def of_plan(cls, values: Dict[str, np.ndarray], plan: ComparisonPlan, table: int) -> 'DistinctColumns':
+        """The columns of table 1 or 2 compared by the plan"""
+        columns = [pair.column1 if table == 1 else pair.column2 for pair in plan.steps]
+        return cls(values, list(dict.fromkeys(columns)))
+
+
+class _PairScoreCache:
+    """Scores of distinct value pairs of one plan step, keyed by their two codes
+
+    Keys are kept sorted for vectorized lookups. Entries are stamped with the last
+    lookup that used them, and once capacity is reached the least recently used
+    ones are evicted.
+    """
+
+    def __init__(self, capacity: int = PAIR_CACHE_SIZE):
+        self.capacity = capacity
+        self.keys = np.array([], dtype=np.int64)
+        self.scores = np.array([], dtype=np.float64)
+        self.stamps = np.array([], dtype=np.int64)
+        self.lookups = 0
+
+    def lookup(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Cached score of every key (0 when absent) and the mask of the keys found"""
+        self.lookups += 1
+        positions = np.searchsorted(self.keys, keys)
+        found = positions < len(self.keys)
+        found[found] = self.keys[positions[found]] == keys[found]
+        self.stamps[positions[found]] = self.lookups
+        scores = np.zeros(len(keys))
+        scores[found] = self.scores[positions[found]]
+        return scores, found
+
+    def store(self, keys: np.ndarray, scores: np.ndarray):
+        """Add sorted keys that are not cached yet, evicting the least recently used entries"""
+        if self.capacity <= 0 or len(keys) == 0:
+            return
+        positions = np.searchsorted(self.keys, keys)
+        self.keys = np.insert(self.keys, positions, keys)
+        self.scores = np.insert(self.scores, positions, scores)
+        self.stamps = np.insert(self.stamps, positions, self.lookups)
+        if len(self.keys) > self.capacity:
+            # Sorted positions of the most recent entries keep the keys sorted
+            kept = np.sort(np.argpartition(-self.stamps, self.capacity - 1)[:self.capacity])
+            self.keys, self.scores, self.stamps = self.keys[kept], self.scores[kept], self.stamps[kept]
+
+
+def _upper_bounds(lengths1: np.ndarray, lengths2: np.ndarray) -> np.ndarray:
+    """Best similarity two values can reach given only their lengths (-1 when one is missing)
+
+    The ratio is 200 * matches / (len1 + len2) and matches <= min(len1, len2). Scores
+    are rounded before the threshold applies, so the bound is rounded the same way
+    (lengths 11 and 15 bound the ratio to 84.6, which can still score 85).
+    """
+    total = lengths1 + lengths2
+    bounds = np.rint(np.divide(200.0 * np.minimum(lengths1, lengths2), total,
+                               out=np.full(len(total), 100.0), where=total > 0))
+    bounds[(lengths1 < 0) | (lengths2 < 0)] = -1.0
+    return bounds
+
+
+def _missing_bounds(lengths1: np.ndarray, lengths2: np.ndarray) -> np.ndarray:
+    """Bounds for scorers without a length bound: 100, or -1 when one value is missing"""
+    return np.where((lengths1 < 0) | (lengths2 < 0), -1.0, 100.0)
+
+
+def _fill_missing(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Replace None by empty strings for the kernel and return the missing mask"""
+    missing = pd.isna(values)
+    return np.where(missing, '', values), missing
+
+
+def _round_scores(scores: np.ndarray, score_cutoff: float) -> np.ndarray:
+    """Round raw ratios like thefuzz does, then zero the scores below score_cutoff
+
+    The kernel is given a cutoff half a point lower, so raw ratios that round up to
+    the cutoff are kept.
+    """
+    scores = np.rint(scores)
+    scores[scores < score_cutoff] = 0.0
+    return scores
+
+
+def score_vector(values1: np.ndarray, values2: np.ndarray, score_cutoff: float = 0) -> np.ndarray:
+    """Element-wise similarity (0-100) of two aligned arrays of normalized values
+
+    Scores below score_cutoff are returned as 0. Missing values always score 0.
+    """
+    strings1, missing1 = _fill_missing(values1)
+    strings2, missing2 = _fill_missing(values2)
+
+    scores = _round_scores(
+        cpdist(strings1, strings2, scorer=fuzz.ratio, score_cutoff=max(score_cutoff - 0.5, 0), dtype=np.float64),
+        score_cutoff
+    )
+    scores[missing1 | missing2] = 0.0
+    return scores
+
+
+def score_matrix(values1: np.ndarray, values2: np.ndarray, score_cutoff: float = 0) -> np.ndarray:
+    """Similarity matrix (0-100) of every value in values1 against every value in values2"""
+    strings1, missing1 = _fill_missing(values1)
+    strings2, missing2 = _fill_missing(values2)
+
+    scores = _round_scores(
+        cdist(strings1, strings2, scorer=fuzz.ratio, score_cutoff=max(score_cutoff - 0.5, 0), dtype=np.float64),
+        score_cutoff
+    )
+    scores[missing1, :] = 0.0
+    scores[:, missing2] = 0.0
+    return scores
+
+
+def _step_bounds(pair: ColumnPair, lengths1: np.ndarray, lengths2: np.ndarray) -> np.ndarray:
+    """Best similarity each comparison of a plan step can reach (-1 when a value is missing)"""
+    return (_missing_bounds if pair.scorer == 'tfidf' else _upper_bounds)(lengths1, lengths2)
+
+
+def _pair_scores(pair: ColumnPair, plan: ComparisonPlan, values1: np.ndarray, values2: np.ndarray,
+                 threshold: float) -> np.ndarray:
+    """Similarity of aligned values with the scorer of a plan step (0 below the threshold)"""
+    if pair.scorer == 'tfidf':
+        return tfidf_scores(plan.vectorizers[(pair.column1, pair.column2)], values1, values2,
+                            score_cutoff=threshold)
+    return score_vector(values1, values2, score_cutoff=threshold)
+
+
+def _memoized_scores(pair: ColumnPair, plan: ComparisonPlan, columns1: DistinctColumns,
+                     columns2: DistinctColumns, left: np.ndarray, right: np.ndarray,
+                     threshold: float, cache: _PairScoreCache, counters: ScoringCounters) -> np.ndarray:
+    """Score row pairs of a plan step, comparing every distinct value pair at most once
+
+    Pairs are reduced to distinct code pairs; those missing from the cache are
+    scored on the distinct values and cached. Reused scores are counted apart
+    from the comparisons executed.
+    """
+    distinct1, distinct2 = columns1.distinct[pair.column1], columns2.distinct[pair.column2]
+    keys, inverse = np.unique(
+        columns1.codes[pair.column1][left] * len(distinct2) + columns2.codes[pair.column2][right],
+        return_inverse=True
+    )
+    scores, found = cache.lookup(keys)
+    new_keys = keys[~found]
+    if len(new_keys):
+        scores[~found] = _pair_scores(pair, plan, distinct1[new_keys // len(distinct2)],
+                                      distinct2[new_keys % len(distinct2)], threshold)
+        cache.store(new_keys, scores[~found])
+    counters.comparisons_executed += len(new_keys)
+    counters.comparisons_reused += len(left) - len(new_keys)
+    return scores[inverse]
+
+
+def _score_batch(columns1: DistinctColumns, columns2: DistinctColumns,
+                 batch_left: np.ndarray, batch_right: np.ndarray, plan: ComparisonPlan,
+                 threshold: float, counters: ScoringCounters, column_scores: bool,
+                 caches: List[_PairScoreCache],
+                 floor: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """Score one batch of pairs; returns the accepted mask, the final scores and the step scores
+
+    Pairs whose best reachable score is below their floor (one value per pair) are
+    dropped before any comparison. caches holds the pair score cache of every step.
+    """
+    steps = plan.steps
+    lengths1, lengths2 = columns1.lengths, columns2.lengths
+    weighted_similarity = np.zeros(len(batch_left))
+    total_weight = np.zeros(len(batch_left))
+    step_scores = np.zeros((len(steps), len(batch_left)), dtype=np.float32) if column_scores else None
+
+    # reachable[i]: column i can pass; still_reachable[i]: some column from i on can
+    bounds = np.array([
+        _step_bounds(pair, lengths1[pair.column1][batch_left], lengths2[pair.column2][batch_right])
+        for pair in steps
+    ]).reshape(len(steps), len(batch_left))
+    reachable = bounds >= threshold
+    still_reachable = np.logical_or.accumulate(reachable[::-1], axis=0)[::-1]
+
+    active = np.ones(len(batch_left), dtype=bool)
+    if floor is not None:
+        # The final score is an average of passing columns, so it cannot exceed the best of their bounds
+        best_bound = np.where(reachable, bounds, -1.0).max(axis=0, initial=-1.0)
+        below_floor = best_bound < floor
+        counters.pairs_pruned += int(below_floor.sum())
+        counters.comparisons_pruned += int(below_floor.sum()) * len(steps)
+        active &= ~below_floor
+
+    for step, pair in enumerate(steps):
+        # Pairs that cannot reach the threshold any more are dropped
+        hopeless = active & (total_weight == 0) & ~still_reachable[step]
+        counters.pairs_pruned += int(hopeless.sum())
+        counters.comparisons_pruned += int(hopeless.sum()) * (len(steps) - step)
+        active &= ~hopeless
+
+        to_score = np.flatnonzero(active & reachable[step])
+        counters.comparisons_pruned += int((active & ~reachable[step]).sum())
+        if len(to_score) == 0:
+            continue
+
+        similarity = _memoized_scores(pair, plan, columns1, columns2, batch_left[to_score],
+                                      batch_right[to_score], threshold, caches[step], counters)
+        if column_scores:
+            step_scores[step, to_score] = similarity
+        passed = similarity >= threshold
+        weighted_similarity[to_score[passed]] += similarity[passed] * pair.weight
+        total_weight[to_score[passed]] += pair.weight
+
+    # Rounded to the float32 scores of the results, so top-k ranks pairs the way they are
+    # reported: (80 + 80 + 60) / 2.2 ties with a single exact column at 100
+    final_score = np.divide(
+        weighted_similarity, total_weight,
+        out=np.zeros(len(batch_left)), where=total_weight > 0
+    ).astype(np.float32).astype(np.float64)
+    accepted = active & (total_weight > 0) & (final_score >= threshold)
+    return accepted, final_score, step_scores
+
+
+class _TopKHeaps:
+    """The k best pairs of every left row, kept as fixed-size arrays sorted best first
+
+    Ties go to the lower right index, so the kept pairs do not depend on the order
+    in which pairs are pushed. Empty slots hold -inf.
+    """
+
+    def __init__(self, rows: int, k: int, steps: int, column_scores: bool):
+        self.k = k
+        self.scores = np.full((rows, k), -np.inf)
+        self.right = np.zeros((rows, k), dtype=np.int64)
+        self.column_scores = np.zeros((rows, k, steps), dtype=np.float32) if column_scores else None
+
+    def floor(self, left: np.ndarray) -> np.ndarray:
+        """Score to beat for every pair: the k-th best score of its row, -inf until the heap is full"""
+        return self.scores[left, self.k - 1]
+
+    def push(self, left: np.ndarray, right: np.ndarray, scores: np.ndarray,
+             column_scores: Optional[np.ndarray] = None):
+        """Merge accepted pairs (column_scores: one row per step) into the heaps of their rows"""
+        rows = np.unique(left)
+        filled = np.isfinite(self.scores[rows])
+        slot_rows = np.repeat(rows, self.k)[filled.ravel()]
+        all_left = np.concatenate([slot_rows, left])
+        all_right = np.concatenate([self.right[rows][filled], right])
+        all_scores = np.concatenate([self.scores[rows][filled], scores])
+
+        order = np.lexsort((all_right, -all_scores, all_left))
+        all_left, all_right, all_scores = all_left[order], all_right[order], all_scores[order]
+        rank = np.arange(len(all_left)) - np.searchsorted(all_left, all_left, side='left')
+        keep = rank < self.k
+
+        self.scores[rows] = -np.inf
+        self.scores[all_left[keep], rank[keep]] = all_scores[keep]
+        self.right[all_left[keep], rank[keep]] = all_right[keep]
+        if self.column_scores is not None:
+            all_columns = np.concatenate([self.column_scores[rows][filled], column_scores.T])[order]
+            self.column_scores[all_left[keep], rank[keep]] = all_columns[keep]
+
+    def pairs(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        """Kept pairs by left row, best first within a row"""
+        filled = np.isfinite(self.scores)
+        left = np.nonzero(filled)[0].astype(np.int64)
+        return (
+            left, self.right[filled], self.scores[filled],
+            self.column_scores[filled].T if self.column_scores is not None else None
+        )
+
+
+def _round_robin(left: np.ndarray, right: np.ndarray, plan: ComparisonPlan, threshold: float,
+                 lengths1: Dict[str, np.ndarray], lengths2: Dict[str, np.ndarray],
+                 batch_size: int) -> np.ndarray:
+    """Order pairs so that the most promising candidate of every left row comes first, then the second...
+
+    Heaps then fill during the first rounds and their floors prune the later ones.
+    """
+    best_bound = np.empty(len(left), dtype=np.float32)
+    for start in range(0, len(left), batch_size):
+        batch_left, batch_right = left[start:start + batch_size], right[start:start + batch_size]
+        bounds = np.array([
+            _step_bounds(pair, lengths1[pair.column1][batch_left], lengths2[pair.column2][batch_right])
+            for pair in plan.steps
+        ]).reshape(len(plan.steps), len(batch_left))
+        best_bound[start:start + batch_size] = np.where(bounds >= threshold, bounds, -1.0).max(axis=0, initial=-1.0)
+
+    by_row = np.lexsort((-best_bound, left))
+    rank = np.empty(len(left), dtype=np.int64)
+    sorted_left = left[by_row]
+    rank[by_row] = np.arange(len(left)) - np.searchsorted(sorted_left, sorted_left, side='left')
+    return np.lexsort((left, rank))
+
+
+def score_candidates(values1: Dict[str, np.ndarray], values2: Optional[Dict[str, np.ndarray]],
+                     left: np.ndarray, right: np.ndarray, plan: ComparisonPlan,
+                     threshold: float, batch_size: int = DEFAULT_BATCH_SIZE,
+                     counters: Optional[ScoringCounters] = None, column_scores: bool = False,
+                     progress: Optional[RunProgress] = None, top_k: Optional[int] = None,
+                     columns2: Optional[DistinctColumns] = None
+                     ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """Score candidate pairs following the plan and aggregate the weighted similarity
+
+    Column similarities below the threshold are ignored, as are final scores below
+    it. Since every counted column is at or above the threshold, a pair is accepted
+    as soon as one column passes. Comparisons that cannot reach the threshold given
+    the value lengths (or a missing value) are skipped, and pairs with no passing
+    column and no reachable column left are dropped early; both are counted in
+    counters; TF-IDF steps have no length bound and only skip missing values.
+    Returns the left indexes, right indexes and scores of the accepted pairs,
+    and with column_scores the similarity of every plan step for them (one float32 row
+    per step, 0 for comparisons below the threshold or skipped), otherwise None.
+    Scored pairs are reported to progress after every batch.
+
+    With top_k, only the k best pairs of every left row are kept, in bounded heaps
+    (ties go to the lower right index). Pairs are scored in rounds, the most promising
+    candidate of every row first, in batches of about one round; once the heap of a
+    row is full its k-th score is a floor, and later pairs of the row that
+    cannot beat it given the value lengths are skipped. Pairs are then returned by
+    left row, best first.
+
+    Columns are factorized into distinct values, and every distinct value pair is
+    compared once: repeated pairs reuse its score from a cache of up to
+    PAIR_CACHE_SIZE pairs per step (counted as comparisons_reused). columns2 is the
+    factorized second table (DistinctColumns.of_plan(values2, plan, 2)); runs scoring
+    several chunks against the same table pass it to factorize it once, and
+    values2 is then not read.
+    """
+    counters = counters if counters is not None else ScoringCounters()
+    steps = plan.steps
+    columns1 = DistinctColumns.of_plan(values1, plan, 1)
+    columns2 = columns2 if columns2 is not None else DistinctColumns.of_plan(values2, plan, 2)
+    caches = [_PairScoreCache() for _ in steps]
+    kept_left, kept_right, kept_scores, kept_column_scores = [], [], [], []
+
+    heaps = None
+    if top_k is not None:
+        rows = int(left.max()) + 1 if len(left) else 0
+        order = _round_robin(left, right, plan, threshold, columns1.lengths, columns2.lengths, batch_size)
+        left, right = left[order], right[order]
+        heaps = _TopKHeaps(rows, top_k, len(steps), column_scores)
+        # About one round per batch, so floors rise from one round to the next
+        batch_size = min(batch_size, TOP_K_BATCH_SIZE, max(rows, TOP_K_MIN_BATCH_SIZE))
+
+    for start in range(0, len(left), batch_size):
+        batch_left = left[start:start + batch_size]
+        batch_right = right[start:start + batch_size]
+        accepted, final_score, step_scores = _score_batch(
+            columns1, columns2, batch_left, batch_right, plan, threshold, counters, column_scores,
+            caches, floor=heaps.floor(batch_left) if heaps is not None else None
+        )
+        if heaps is not None:
+            heaps.push(batch_left[accepted], batch_right[accepted], final_score[accepted],
+                       step_scores[:, accepted] if column_scores else None)
+        else:
+            kept_left.append(batch_left[accepted])
+            kept_right.append(batch_right[accepted])
+            kept_scores.append(final_score[accepted])
+            if column_scores:
+                kept_column_scores.append(step_scores[:, accepted])
+        if progress is not None:
+            progress.advance(len(batch_left))
+
+    if heaps is not None:
+        return heaps.pairs()
+    if not kept_left:
+        return (
+            np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.array([], dtype=np.float64),
+            np.zeros((len(steps), 0), dtype=np.float32) if column_scores else None
+        )
+    return (
+        np.concatenate(kept_left), np.concatenate(kept_right), np.concatenate(kept_scores),
+        np.concatenate(kept_column_scores, axis=1) if column_scores else None
+    )
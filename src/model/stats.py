@@ -0,0 +1,176 @@
+import os
+import sys
+import time
+import threading
+import pandas as pd
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+def peak_memory_bytes() -> Optional[int]:
+    """High-water mark of the resident memory of this process, None where unsupported"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def current_memory_bytes() -> Optional[int]:
+    """Resident memory of this process right now, None where unsupported (read from /proc on Linux)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def children_cpu_time() -> float:
+    """CPU time of the finished child processes (e.g. scoring workers)"""
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+@dataclass
+class StageStats:
+    """Time spent in one stage, summed over every time it ran (chunks, threads)"""
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    calls: int = 0
+
+
+class StatsHook:
+    """Base class for receivers of run metrics (e.g. a metrics exporter)
+
+    Override the methods of interest; both are called from the thread running the stage.
+    """
+
+    def on_stage_end(self, stage: str, wall_time: float, cpu_time: float):
+        """Called every time a stage finishes, with the time it just took"""
+
+    def on_run_end(self, stats: 'RunStats'):
+        """Called once the run is complete"""
+
+
+@dataclass
+class RunStats:
+    """Structured metrics of one matching run
+
+    CPU time is measured per thread, plus the CPU time of worker processes for the
+    stages that use them. peak_memory_bytes is the peak resident memory of this run:
+    the high-water mark of the process when the run raised it, otherwise the largest
+    resident memory sampled when stages start and end (an earlier, larger run would
+    hide the run's own peak from the high-water mark). None when neither applies,
+    e.g. where resident memory cannot be sampled.
+    """
+    stages: Dict[str, StageStats] = field(default_factory=dict)
+    wall_time: float = 0.0
+    rows_fetched: int = 0
+    rows_from_cache: int = 0
+    bytes_fetched: int = 0
+    candidate_pairs: int = 0
+    total_pairs: int = 0
+    pairs_pruned: int = 0
+    comparisons_executed: int = 0
+    comparisons_pruned: int = 0
+    comparisons_reused: int = 0
+    matches: int = 0
+    peak_memory_bytes: Optional[int] = None
+    hooks: List[StatsHook] = field(default_factory=list, repr=False)
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._peak_before = peak_memory_bytes()
+        self._sampled_peak = current_memory_bytes()
+
+    def _sample_memory(self):
+        memory = current_memory_bytes()
+        if memory is not None:
+            with self._lock:
+                self._sampled_peak = max(self._sampled_peak or 0, memory)
+
+    def _run_peak_memory(self) -> Optional[int]:
+        """Peak resident memory of the run, see the class docstring"""
+        self._sample_memory()
+        peak = peak_memory_bytes()
+        if peak is not None and (self._peak_before is None or peak > self._peak_before):
+            return peak
+        return self._sampled_peak
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed block as (one more run of) a stage"""
+        self._sample_memory()
+        wall_start, cpu_start, children_start = time.perf_counter(), time.thread_time(), children_cpu_time()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - wall_start
+            cpu_time = time.thread_time() - cpu_start + children_cpu_time() - children_start
+            self._sample_memory()
+            with self._lock:
+                stage = self.stages.setdefault(name, StageStats())
+                stage.wall_time += wall_time
+                stage.cpu_time += cpu_time
+                stage.calls += 1
+            for hook in self.hooks:
+                hook.on_stage_end(name, wall_time, cpu_time)
+
+    def add_fetched(self, chunk: pd.DataFrame, from_cache: bool = False):
+        """Count the rows and in-memory bytes of a fetched chunk"""
+        with self._lock:
+            if from_cache:
+                self.rows_from_cache += len(chunk)
+            else:
+                self.rows_fetched += len(chunk)
+                self.bytes_fetched += int(chunk.memory_usage(index=False, deep=True).sum())
+
+    def finish(self, blocking_report=None, scoring_counters=None, matches: int = 0):
+        """Collect the counters of the run, then notify the hooks"""
+        self.wall_time = time.perf_counter() - self._started
+        if blocking_report is not None:
+            self.candidate_pairs = blocking_report.candidate_pairs
+            self.total_pairs = blocking_report.total_pairs
+        if scoring_counters is not None:
+            self.pairs_pruned = scoring_counters.pairs_pruned
+            self.comparisons_executed = scoring_counters.comparisons_executed
+            self.comparisons_pruned = scoring_counters.comparisons_pruned
+            self.comparisons_reused = scoring_counters.comparisons_reused
+        self.matches = matches
+        self.peak_memory_bytes = self._run_peak_memory()
+        for hook in self.hooks:
+            hook.on_run_end(self)
+
+    def stage_table(self) -> pd.DataFrame:
+        """Stage timings as a DataFrame, one row per stage"""
+        return pd.DataFrame(
+            [(name, stage.wall_time, stage.cpu_time, stage.calls) for name, stage in self.stages.items()],
+            columns=['stage', 'wall_time', 'cpu_time', 'calls']
+        )
+
+    def to_dict(self) -> dict:
+        """Plain dict of the metrics, e.g. to export them as JSON"""
+        return {
+            'stages': {name: vars(stage).copy() for name, stage in self.stages.items()},
+            'wall_time': self.wall_time,
+            'rows_fetched': self.rows_fetched,
+            'rows_from_cache': self.rows_from_cache,
+            'bytes_fetched': self.bytes_fetched,
+            'candidate_pairs': self.candidate_pairs,
+            'total_pairs': self.total_pairs,
+            'pairs_pruned': self.pairs_pruned,
+            'comparisons_executed': self.comparisons_executed,
+            'comparisons_pruned': self.comparisons_pruned,
+            'comparisons_reused': self.comparisons_reused,
+            'matches': self.matches,
+            'peak_memory_bytes': self.peak_memory_bytes
+        }
@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from typing import Optional, Tuple, Union
+
+# Distinct values turned into n-grams at a time, bounds the size of the character arrays
+VECTORIZE_BATCH_SIZE = 100_000
+
+# Upper bound on the non-zero similarities computed per block of rows in top_k_neighbours
+MAX_PRODUCT_NNZ = 5_000_000
+
+# Bits per character in an encoded n-gram (Unicode code points are below 2**21)
+_CHAR_BITS = 21
+
+
+def _ngram_codes(values: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Character n-grams of every value, encoded as int64 codes, with the index of their value
+
+    Values are padded with a space on both sides so word boundaries are part of the
+    n-grams. Values shorter than n yield a single (zero padded) n-gram.
+    """
+    padded = np.char.add(np.char.add(' ', values.astype(str)), ' ')
+    width = max(padded.dtype.itemsize // 4, n)
+    chars = np.zeros((len(padded), width), dtype=np.int64)
+    chars[:, :padded.dtype.itemsize // 4] = padded.view(np.uint32).reshape(len(padded), -1)
+
+    codes = np.zeros((len(padded), width - n + 1), dtype=np.int64)
+    for offset in range(n):
+        codes |= chars[:, offset:width - n + 1 + offset] << (_CHAR_BITS * (n - 1 - offset))
+    counts = np.maximum(np.char.str_len(padded) - n + 1, 1)
+    valid = np.arange(width - n + 1) < counts[:, None]
+    return np.nonzero(valid)[0], codes[valid]
+
+
+class NgramVectorizer:
+    """Character n-gram TF-IDF vectors of short strings (names, addresses)
+
+    The vocabulary and the inverse document frequencies are learnt from one side by
+    fit. N-grams unseen during fit still count in the norm of a vector (with the
+    highest idf), so they lower its similarity to everything instead of being ignored.
+    Vectors are L2-normalized, so the dot product of two rows is their cosine similarity.
+
+    With max_df, n-grams found in more than that many fitted values (a share of them
+    when a float, a count when an int) are dropped from every vector like stop
+    words, and norms are taken over the remaining ones. Products then skip the n-grams shared by most records, at the
+    cost of approximate similarities.
+    """
+
+    def __init__(self, ngram_size: int = 3, max_df: Optional[Union[float, int]] = None):
+        if not 1 <= ngram_size <= 3:
+            raise ValueError("ngram_size must be between 1 and 3")
+        if max_df is not None and (max_df <= 0 or (isinstance(max_df, float) and max_df > 1)):
+            raise ValueError("max_df must be a share in (0, 1] or a positive count")
+        self.ngram_size = ngram_size
+        self.max_df = max_df
+        self.ngrams = np.array([], dtype=np.int64)
+        self.idf = np.array([], dtype=np.float64)
+        self.unseen_idf = 1.0
+        self.stop_ngrams = np.array([], dtype=np.int64)
+
+    def _term_counts(self, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(value index, n-gram code, count) of every distinct n-gram of every value"""
+        rows, codes = [], []
+        for start in range(0, len(values), VECTORIZE_BATCH_SIZE):
+            batch_rows, batch_codes = _ngram_codes(values[start:start + VECTORIZE_BATCH_SIZE], self.ngram_size)
+            rows.append(batch_rows + start)
+            codes.append(batch_codes)
+        if not rows:
+            empty = np.array([], dtype=np.int64)
+            return empty, empty, empty
+        terms = pd.DataFrame({'row': np.concatenate(rows), 'code': np.concatenate(codes)})
+        counts = terms.groupby(['row', 'code'], sort=False).size()
+        return (counts.index.get_level_values('row').to_numpy(),
+                counts.index.get_level_values('code').to_numpy(), counts.to_numpy())
+
+    def fit(self, values: np.ndarray) -> 'NgramVectorizer':
+        """Learn the n-grams and their idf from the distinct non-missing values"""
+        distinct = pd.unique(pd.Series(values, dtype=object).dropna().to_numpy())
+        _, codes, _ = self._term_counts(distinct)
+        self.ngrams, document_frequency = np.unique(codes, return_counts=True)
+        if self.max_df is not None:
+            limit = self.max_df * len(distinct) if isinstance(self.max_df, float) else self.max_df
+            frequent = document_frequency > limit
+            self.stop_ngrams = self.ngrams[frequent]
+            self.ngrams, document_frequency = self.ngrams[~frequent], document_frequency[~frequent]
+        # Smoothed idf, as if one extra document contained every n-gram
+        self.idf = np.log((1 + len(distinct)) / (1 + document_frequency)) + 1
+        self.unseen_idf = np.log(1 + len(distinct)) + 1
+        return self
+
+    def transform(self, values: np.ndarray) -> sp.csr_matrix:
+        """Sparse matrix with the normalized vector of every value (an empty row when missing)"""
+        value_codes, distinct = pd.factorize(pd.Series(values, dtype=object))
+        rows, codes, counts = self._term_counts(np.asarray(distinct, dtype=object))
+        if len(self.stop_ngrams):
+            kept = ~np.isin(codes, self.stop_ngrams)
+            rows, codes, counts = rows[kept], codes[kept], counts[kept]
+
+        columns = np.searchsorted(self.ngrams, codes)
+        columns = np.minimum(columns, max(len(self.ngrams) - 1, 0))
+        known = (self.ngrams[columns] == codes) if len(self.ngrams) else np.zeros(len(codes), dtype=bool)
+        weights = counts * np.where(known, self.idf[columns] if len(self.ngrams) else 0.0, self.unseen_idf)
+
+        norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=len(distinct)))
+        weights = weights / norms[rows]
+        vectors = sp.csr_matrix(
+            (weights[known], (rows[known], columns[known])),
+            shape=(len(distinct) + 1, len(self.ngrams))
+        )
+        # Missing values point to the extra empty row
+        value_codes = np.where(value_codes < 0, len(distinct), value_codes)
+        return vectors[value_codes]
+
+    def fit_transform(self, values: np.ndarray) -> sp.csr_matrix:
+        return self.fit(values).transform(values)
+
+
+def cosine_similarity(vectors1: sp.csr_matrix, vectors2: sp.csr_matrix) -> np.ndarray:
+    """Element-wise cosine similarity of the aligned rows of two normalized matrices"""
+    return np.asarray(vectors1.multiply(vectors2).sum(axis=1)).ravel()
+
+
+def top_k_neighbours(vectors1: sp.csr_matrix, vectors2: sp.csr_matrix, k: int,
+                     min_similarity: float = 0.0, exclude_self: bool = False
+                     ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """The k rows of vectors2 most similar to every row of vectors1, above min_similarity
+
+    Similarities are computed by sparse matrix products over blocks of rows of
+    vectors1, sized so that no block holds more than MAX_PRODUCT_NNZ similarities.
+    Only rows sharing an n-gram are ever multiplied, so the work follows the overlap
+    of the values rather than the size of the cross product. With exclude_self (both
+    sides being the same matrix) a row is not its own neighbour. Returns the left
+    rows, right rows and similarities of the kept pairs.
+    """
+    vectors2_t = vectors2.T.tocsr()
+    # Upper bound of the non-zero similarities of each row: the rows sharing each of its n-grams
+    document_frequency = np.diff(vectors2_t.indptr)
+    bounds = np.cumsum((vectors1 != 0).astype(np.int64) @ document_frequency)
+
+    lefts, rights, similarities = [], [], []
+    start = 0
+    while start < vectors1.shape[0]:
+        base = bounds[start - 1] if start else 0
+        stop = max(int(np.searchsorted(bounds, base + MAX_PRODUCT_NNZ, side='right')), start + 1)
+        product = (vectors1[start:stop] @ vectors2_t).tocoo()
+
+        keep = product.data >= min_similarity
+        rows, columns, data = product.row[keep] + start, product.col[keep], product.data[keep]
+        if exclude_self:
+            keep = rows != columns
+            rows, columns, data = rows[keep], columns[keep], data[keep]
+
+        # Rank the similarities of every row, best first, and keep the first k
+        order = np.lexsort((-data, rows))
+        rows, columns, data = rows[order], columns[order], data[order]
+        row_start = np.searchsorted(rows, rows, side='left')
+        keep = np.arange(len(rows)) - row_start < k
+        lefts.append(rows[keep].astype(np.int64))
+        rights.append(columns[keep].astype(np.int64))
+        similarities.append(data[keep])
+        start = stop
+
+    if not lefts:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, np.array([], dtype=np.float64)
+    return np.concatenate(lefts), np.concatenate(rights), np.concatenate(similarities)
+
+
+def tfidf_scores(vectorizer: NgramVectorizer, values1: np.ndarray, values2: np.ndarray,
+                 score_cutoff: float = 0) -> np.ndarray:
+    """Element-wise TF-IDF cosine similarity (0-100) of two aligned arrays of values
+
+    Scores below score_cutoff are returned as 0, like score_vector. Missing values score 0.
+    """
+    vectors1, vectors2 = vectorizer.transform(values1), vectorizer.transform(values2)
+    scores = np.rint(100.0 * cosine_similarity(vectors1, vectors2))
+    scores[scores < score_cutoff] = 0.0
+    return scores
@@ -0,0 +1,38 @@
+import pandas as pd
+from src.model.blocking import Blocker, EmailLocalPartKey, PhoneSuffixKey
+from src.model.model_run import ColumnMetadata
+from src.model.normalization import add_normalized_columns
+
+
+def normalized_frame(data: dict) -> pd.DataFrame:
+    columns_meta = [ColumnMetadata(name, 'varchar', 'contact') for name in data]
+    return add_normalized_columns(pd.DataFrame(data), columns_meta)
+
+
+def pairs(candidates):
+    return set(zip(candidates.left.tolist(), candidates.right.tolist()))
+
+
+class TestBlockKeys:
+    def test_email_key_uses_the_normalized_address(self):
+        df1 = normalized_frame({'email': ['John.Smith@example.org', 'mary@example.org']})
+        df2 = normalized_frame({'user_email': ['john.smith.at.example.org', 'mailto:mary+news@example.org']})
+        blocker = Blocker.from_columns([ColumnMetadata('email', 'varchar', 'contact')],
+                                       [ColumnMetadata('user_email', 'varchar', 'contact')])
+        assert isinstance(blocker.rules[0].key, EmailLocalPartKey)
+        assert blocker.block_keys(df2, 2).iloc[:, 0].tolist() == ['johnsmith', 'mary']
+        assert pairs(blocker.candidate_pairs(df1, df2)) == {(0, 0), (1, 1)}
+
+    def test_phone_key_uses_the_normalized_number(self):
+        df1 = normalized_frame({'phone': ['+1 (555) 123-4567', '555-765-4321']})
+        df2 = normalized_frame({'contact_number': ['5551234567', '0015557654321']})
+        blocker = Blocker.from_columns([ColumnMetadata('phone', 'varchar', 'contact')],
+                                       [ColumnMetadata('contact_number', 'varchar', 'contact')])
+        assert isinstance(blocker.rules[0].key, PhoneSuffixKey)
+        assert pairs(blocker.candidate_pairs(df1, df2)) == {(0, 0), (1, 1)}
+
+    def test_raw_values_without_normalized_columns(self):
+        df = pd.DataFrame({'email': ['John+tag@example.org']})
+        blocker = Blocker.from_columns([ColumnMetadata('email', 'varchar', 'contact')],
+                                       [ColumnMetadata('email', 'varchar', 'contact')])
+        assert blocker.block_keys(df, 1).iloc[:, 0].tolist() == ['john']
@@ -0,0 +1,47 @@
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from src.model.clustering import UnionFind
+
+
+def first_appearance(labels: np.ndarray) -> np.ndarray:
+    """Renumber cluster labels in the order they first appear"""
+    _, first, inverse = np.unique(labels, return_index=True, return_inverse=True)
+    return np.argsort(np.argsort(first))[inverse]
+
+
+class TestUnionFind:
+    def test_singletons(self):
+        assert UnionFind(4).components().tolist() == [0, 1, 2, 3]
+
+    def test_chain_is_one_cluster(self):
+        clusters = UnionFind(6)
+        clusters.union(np.array([4, 3, 2]), np.array([5, 4, 3]))
+        assert clusters.components().tolist() == [0, 1, 2, 2, 2, 2]
+
+    def test_hub(self):
+        clusters = UnionFind(5)
+        clusters.union(np.array([3, 3, 3]), np.array([4, 1, 2]))
+        assert clusters.components().tolist() == [0, 1, 1, 1, 1]
+        assert clusters.find(np.array([4])).tolist() == [1]
+
+    def test_unions_in_several_calls(self):
+        clusters = UnionFind(6)
+        clusters.union(np.array([0]), np.array([5]))
+        clusters.union(np.array([2]), np.array([3]))
+        clusters.union(np.array([3]), np.array([5]))
+        assert clusters.components().tolist() == [0, 1, 0, 0, 2, 0]
+
+    def test_matches_connected_components(self):
+        rng = np.random.default_rng(5)
+        n = 2000
+        clusters = UnionFind(n)
+        edges = []
+        for _ in range(4):
+            a, b = rng.integers(0, n, 600), rng.integers(0, n, 600)
+            clusters.union(a, b)
+            edges.append((a, b))
+        a, b = np.concatenate([edge[0] for edge in edges]), np.concatenate([edge[1] for edge in edges])
+        graph = coo_matrix((np.ones(len(a)), (a, b)), shape=(n, n))
+        _, labels = connected_components(graph, directed=False)
+        assert clusters.components().tolist() == first_appearance(labels).tolist()
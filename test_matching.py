@@ -171,9 +171,9 @@ def main():
             print("\nSample matches:")
             print(results.head())
             print("\nMatching statistics:")
-            print(f"Average similarity score: {results['similarity_score'].mean():.2f}%")
-            print(f"Minimum similarity score: {results['similarity_score'].min():.2f}%")
-            print(f"Maximum similarity score: {results['similarity_score'].max():.2f}%")
+            print(f"Average similarity score: {results.scores.mean():.2f}%")
+            print(f"Minimum similarity score: {results.scores.min():.2f}%")
+            print(f"Maximum similarity score: {results.scores.max():.2f}%")
         
     except Exception as e:
         print(f"Error: {str(e)}")
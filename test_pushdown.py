@@ -0,0 +1,131 @@
+from contextlib import contextmanager
+import pytest
+from src.connectors.redshift_connector import RedshiftConnector
+from src.model.model_run import ColumnMetadata, UniqueIdentifier
+
+
+class RecordingCursor:
+    def __init__(self, queries, rows):
+        self.queries = queries
+        self.rows = rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, query, params=None):
+        self.queries.append(query)
+
+    def fetchall(self):
+        return self.rows
+
+
+class RecordingConnector(RedshiftConnector):
+    """Redshift connector that records its SQL instead of sending it"""
+
+    def __init__(self, rows=()):
+        super().__init__()
+        self.pool = True
+        self.queries = []
+        self.rows = list(rows)
+
+    @contextmanager
+    def get_connection(self):
+        connector = self
+
+        class Connection:
+            def cursor(self):
+                return RecordingCursor(connector.queries, connector.rows)
+
+        yield Connection()
+
+
+def squash(sql: str) -> str:
+    return ' '.join(sql.split())
+
+
+EMAIL = RedshiftConnector.SQL_NORMALIZERS['email']
+IDENTITY = RedshiftConnector.SQL_NORMALIZERS['identity']
+
+
+class TestExactMatchSql:
+    def test_join_per_column_pair(self):
+        connector = RecordingConnector(rows=[(1, 7), (2, 8)])
+        matches = connector.find_exact_matches(
+            'public', 'customers', 'id', 'sales', 'users', 'user_id',
+            [('email', 'user_email', 'email'), ('customer_id', 'external_id', 'identity')]
+        )
+        assert matches.values.tolist() == [[1, 7], [2, 8]]
+        assert list(matches.columns) == ['table1_id', 'table2_id']
+
+        query = squash(connector.queries[0])
+        email1, email2 = EMAIL.format(column='t1.email'), EMAIL.format(column='t2.user_email')
+        identity1, identity2 = IDENTITY.format(column='t1.customer_id'), IDENTITY.format(column='t2.external_id')
+        assert query == squash(
+            f"SELECT t1.id AS table1_id, t2.user_id AS table2_id FROM public.customers t1 "
+            f"JOIN sales.users t2 ON {email1} = {email2} WHERE {email1} <> '' UNION "
+            f"SELECT t1.id AS table1_id, t2.user_id AS table2_id FROM public.customers t1 "
+            f"JOIN sales.users t2 ON {identity1} = {identity2} WHERE {identity1} <> ''"
+        )
+
+    def test_requires_a_connection(self):
+        connector = RedshiftConnector()
+        with pytest.raises(ConnectionError):
+            connector.find_exact_matches('public', 'customers', 'id', 'sales', 'users', 'id',
+                                         [('email', 'user_email', 'email')])
+
+    def test_residual_filter(self):
+        where = RedshiftConnector().exact_match_residual_filter(
+            'public', 'customers', 'sales', 'users',
+            [('email', 'user_email', 'email'), ('customer_id', 'external_id', 'identity')]
+        )
+        email, other_email = EMAIL.format(column='public.customers.email'), EMAIL.format(column='other.user_email')
+        identity = IDENTITY.format(column='public.customers.customer_id')
+        other_identity = IDENTITY.format(column='other.external_id')
+        assert where == (
+            f"NOT EXISTS (SELECT 1 FROM sales.users other WHERE {other_email} = {email} AND {email} <> '') AND "
+            f"NOT EXISTS (SELECT 1 FROM sales.users other WHERE {other_identity} = {identity} AND {identity} <> '')"
+        )
+
+
+class TestPushdownPlan:
+    def test_pushes_identity_and_email_pairs_only(self):
+        connector = RecordingConnector(rows=[(1, 7)])
+        identifier = UniqueIdentifier(connector)
+        columns1 = [ColumnMetadata('email', 'varchar', 'contact'), ColumnMetadata('phone', 'varchar', 'contact'),
+                    ColumnMetadata('tax_id', 'varchar', 'identity'), ColumnMetadata('full_name', 'varchar', 'name')]
+        columns2 = [ColumnMetadata('user_email', 'varchar', 'contact'),
+                    ColumnMetadata('contact_number', 'varchar', 'contact'),
+                    ColumnMetadata('national_id', 'varchar', 'identity'), ColumnMetadata('name', 'varchar', 'name')]
+        exact, where1, where2 = identifier._pushdown_exact_matches(
+            'public', 'customers', columns1, 'id', 'sales', 'users', columns2, 'id'
+        )
+        assert exact.table1_id.tolist() == [1] and exact.table2_id.tolist() == [7]
+        assert exact.scores.tolist() == [100.0]
+        assert exact.match_type.tolist() == ['exact_pushdown']
+
+        query = connector.queries[0]
+        assert query.count('SELECT') == 2
+        assert EMAIL.format(column='t1.email') in query
+        assert IDENTITY.format(column='t1.tax_id') in query
+        assert 'phone' not in query and 'name' not in query
+        assert where1 == connector.exact_match_residual_filter(
+            'public', 'customers', 'sales', 'users',
+            [('email', 'user_email', 'email'), ('tax_id', 'national_id', 'identity')]
+        )
+        assert where2 == connector.exact_match_residual_filter(
+            'sales', 'users', 'public', 'customers',
+            [('user_email', 'email', 'email'), ('national_id', 'tax_id', 'identity')]
+        )
+
+    def test_nothing_to_push(self):
+        connector = RecordingConnector()
+        identifier = UniqueIdentifier(connector)
+        columns1 = [ColumnMetadata('full_name', 'varchar', 'name')]
+        columns2 = [ColumnMetadata('name', 'varchar', 'name')]
+        assert identifier._pushdown_exact_matches(
+            'public', 'customers', columns1, 'id', 'sales', 'users', columns2, 'id'
+        ) == (None, None, None)
+        assert connector.queries == []
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+from src.model.results import MatchResult
+
+
+def match_result(pairs):
+    """MatchResult of (table1_id, table2_id, score) tuples without source columns"""
+    table1_id, table2_id, scores = (np.array(column) for column in zip(*pairs))
+    return MatchResult(table1_id, table2_id, scores, pd.DataFrame(), pd.DataFrame())
+
+
+def id_pairs(result: MatchResult):
+    return list(zip(result.table1_id.tolist(), result.table2_id.tolist()))
+
+
+class TestOneToOne:
+    def test_best_match_taken_first(self):
+        result = match_result([(1, 10, 90), (1, 11, 95), (2, 11, 99), (2, 10, 86)])
+        assert id_pairs(result.one_to_one()) == [(1, 10), (2, 11)]
+
+    def test_greedy_not_optimal(self):
+        # Taking (1, 10) first leaves 2 without a match, although (1, 11) and (2, 10) would pair everyone
+        result = match_result([(1, 10, 99), (1, 11, 90), (2, 10, 95)])
+        assert id_pairs(result.one_to_one()) == [(1, 10)]
+
+    def test_ties_go_to_the_lower_ids(self):
+        result = match_result([(2, 10, 90), (1, 11, 90), (1, 10, 90), (2, 11, 90)])
+        assert id_pairs(result.one_to_one()) == [(1, 10), (2, 11)]
+
+    def test_keeps_order_and_scores(self):
+        result = match_result([(3, 30, 88), (1, 10, 97), (3, 10, 99), (1, 30, 85)]).one_to_one()
+        assert id_pairs(result) == [(3, 10), (1, 30)]
+        assert result.scores.tolist() == [99, 85]
+
+    def test_every_record_used_once(self):
+        rng = np.random.default_rng(9)
+        pairs = [(int(i), int(j), float(score)) for i, j, score in
+                 zip(rng.integers(0, 50, 500), rng.integers(0, 50, 500), rng.integers(85, 101, 500))]
+        result = match_result(pairs).one_to_one()
+        assert len(set(result.table1_id.tolist())) == len(result)
+        assert len(set(result.table2_id.tolist())) == len(result)
@@ -0,0 +1,231 @@
+import random
+import string
+import numpy as np
+import pytest
+from thefuzz import fuzz
+from src.model.scoring import (
+    ColumnPair, ComparisonPlan, DistinctColumns, ScoringCounters, _PairScoreCache, _upper_bounds,
+    score_candidates, score_matrix, score_vector
+)
+
+THRESHOLD = 85
+
+
+def mutate(rng: random.Random, value: str, edits: int) -> str:
+    """Apply random insertions, deletions and substitutions"""
+    value = list(value)
+    for _ in range(edits):
+        position = rng.randrange(len(value) + 1)
+        operation = rng.choice(['insert', 'delete', 'substitute'])
+        if operation == 'insert' or not value:
+            value.insert(position, rng.choice(string.ascii_lowercase))
+        elif operation == 'delete' or position == len(value):
+            del value[min(position, len(value) - 1)]
+        else:
+            value[position] = rng.choice(string.ascii_lowercase)
+    return ''.join(value)
+
+
+def near_duplicates(rng: random.Random, count: int, distinct: int):
+    """Two aligned lists of lowercase strings, mostly a few edits apart, drawn from few distinct values"""
+    bases = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 24))) for _ in range(distinct)]
+    values1 = [rng.choice(bases) for _ in range(count)]
+    values2 = [mutate(rng, value, rng.randint(0, 3)) for value in values1]
+    return values1, values2
+
+
+def reference_scores(values1, values2, left, right, plan, threshold):
+    """Pair by pair scoring with thefuzz, the behaviour the vectorized scorer reproduces"""
+    accepted = {}
+    for i, j in zip(left.tolist(), right.tolist()):
+        weighted, total = 0.0, 0.0
+        for pair in plan.steps:
+            value1, value2 = values1[pair.column1][i], values2[pair.column2][j]
+            if value1 is None or value2 is None:
+                continue
+            similarity = fuzz.ratio(value1, value2)
+            if similarity >= threshold:
+                weighted += similarity * pair.weight
+                total += pair.weight
+        score = np.float32(weighted / total) if total else 0.0
+        if total and score >= threshold:
+            accepted[(i, j)] = float(score)
+    return accepted
+
+
+def as_dict(left, right, scores):
+    return {(i, j): float(score) for i, j, score in zip(left.tolist(), right.tolist(), scores.tolist())}
+
+
+@pytest.fixture
+def tables():
+    """Two tables of 300 rows with an email-like and a name-like column, some values missing"""
+    rng = random.Random(7)
+    emails1, emails2 = near_duplicates(rng, 300, 120)
+    names1, names2 = near_duplicates(rng, 300, 40)
+    for values in (emails1, names2):
+        for position in rng.sample(range(300), 20):
+            values[position] = None
+    values1 = {'email': np.array(emails1, dtype=object), 'name': np.array(names1, dtype=object)}
+    values2 = {'user_email': np.array(emails2, dtype=object), 'full_name': np.array(names2, dtype=object)}
+    plan = ComparisonPlan.compile(
+        [ColumnPair('email', 'user_email', 0.8), ColumnPair('name', 'full_name', 0.6)], values2
+    )
+    pairs = np.array([(i, j) for i in range(300) for j in rng.sample(range(300), 10)] + [(i, i) for i in range(300)])
+    return values1, values2, plan, pairs[:, 0].astype(np.int64), pairs[:, 1].astype(np.int64)
+
+
+class TestScoreVector:
+    def test_matches_thefuzz(self):
+        rng = random.Random(1)
+        values1, values2 = near_duplicates(rng, 2000, 500)
+        scores = score_vector(np.array(values1, dtype=object), np.array(values2, dtype=object))
+        assert scores.tolist() == [fuzz.ratio(value1, value2) for value1, value2 in zip(values1, values2)]
+
+    def test_rounds_up_to_the_threshold(self):
+        # 200 * 11 / 26 = 84.6 rounds to 85 in thefuzz and passes
+        value1, value2 = 'abcdefghijk', 'abcdefghijklmno'
+        assert fuzz.ratio(value1, value2) == THRESHOLD
+        assert score_vector(np.array([value1], dtype=object), np.array([value2], dtype=object),
+                            score_cutoff=THRESHOLD).tolist() == [THRESHOLD]
+
+    def test_rounds_down_below_the_threshold(self):
+        # 200 * 27 / 64 = 84.4 rounds to 84 and is cut
+        value1, value2 = 'a' * 27, 'a' * 37
+        assert fuzz.ratio(value1, value2) == 84
+        assert score_vector(np.array([value1], dtype=object), np.array([value2], dtype=object),
+                            score_cutoff=THRESHOLD).tolist() == [0]
+
+    def test_missing_values_score_zero(self):
+        scores = score_vector(np.array(['abc', None], dtype=object), np.array([None, None], dtype=object))
+        assert scores.tolist() == [0, 0]
+
+    def test_matrix_matches_vector(self):
+        rng = random.Random(2)
+        values1, values2 = near_duplicates(rng, 40, 10)
+        values1, values2 = np.array(values1, dtype=object), np.array(values2, dtype=object)
+        matrix = score_matrix(values1, values2, score_cutoff=THRESHOLD)
+        left, right = np.divmod(np.arange(40 * 40), 40)
+        assert matrix.ravel().tolist() == score_vector(values1[left], values2[right], score_cutoff=THRESHOLD).tolist()
+
+
+class TestLengthBounds:
+    def test_bounds_are_never_below_the_score(self):
+        rng = random.Random(3)
+        values1, values2 = near_duplicates(rng, 5000, 1000)
+        lengths1 = np.array([len(value) for value in values1])
+        lengths2 = np.array([len(value) for value in values2])
+        scores = np.array([fuzz.ratio(value1, value2) for value1, value2 in zip(values1, values2)])
+        assert (_upper_bounds(lengths1, lengths2) >= scores).all()
+
+    def test_bound_rounds_like_the_score(self):
+        bounds = _upper_bounds(np.array([11, 27, 3, -1]), np.array([15, 37, 3, 4]))
+        assert bounds.tolist() == [85, 84, 100, -1]
+
+    def test_unreachable_comparisons_are_pruned(self):
+        values1 = {'email': np.array(['abcdef', 'abcdefghijklmnopqrst'], dtype=object)}
+        values2 = {'user_email': np.array(['abcdef', 'abc'], dtype=object)}
+        plan = ComparisonPlan.compile([ColumnPair('email', 'user_email', 0.8)], values2)
+        counters = ScoringCounters()
+        left, right, scores, _ = score_candidates(
+            values1, values2, np.array([0, 0, 1, 1]), np.array([0, 1, 0, 1]), plan, THRESHOLD, counters=counters
+        )
+        assert as_dict(left, right, scores) == {(0, 0): 100.0}
+        # Only the equal-length pair can reach the threshold
+        assert counters.comparisons_executed == 1
+        assert counters.comparisons_pruned == 3
+        assert counters.pairs_pruned == 3
+
+
+class TestScoreCandidates:
+    def test_matches_reference(self, tables):
+        values1, values2, plan, left, right = tables
+        counters = ScoringCounters()
+        result = score_candidates(values1, values2, left, right, plan, THRESHOLD, counters=counters)
+        assert as_dict(*result[:3]) == reference_scores(values1, values2, left, right, plan, THRESHOLD)
+        assert counters.comparisons_pruned > 0
+
+    def test_repeated_value_pairs_are_scored_once(self, tables):
+        values1, values2, plan, left, right = tables
+        counters = ScoringCounters()
+        score_candidates(values1, values2, np.tile(left, 3), np.tile(right, 3), plan, THRESHOLD, counters=counters)
+        assert counters.comparisons_reused > 2 * counters.comparisons_executed
+
+    def test_small_batches_reuse_cached_scores(self, tables):
+        values1, values2, plan, left, right = tables
+        expected = score_candidates(values1, values2, left, right, plan, THRESHOLD)
+        result = score_candidates(values1, values2, left, right, plan, THRESHOLD, batch_size=97)
+        assert as_dict(*result[:3]) == as_dict(*expected[:3])
+
+    def test_factorized_second_table(self, tables):
+        values1, values2, plan, left, right = tables
+        expected = score_candidates(values1, values2, left, right, plan, THRESHOLD)
+        columns2 = DistinctColumns.of_plan(values2, plan, 2)
+        result = score_candidates(values1, None, left, right, plan, THRESHOLD, columns2=columns2)
+        assert as_dict(*result[:3]) == as_dict(*expected[:3])
+
+    def test_column_scores(self, tables):
+        values1, values2, plan, left, right = tables
+        left, right, scores, column_scores = score_candidates(
+            values1, values2, left, right, plan, THRESHOLD, column_scores=True
+        )
+        assert column_scores.shape == (len(plan.steps), len(left))
+        for step, pair in enumerate(plan.steps):
+            for i, j, similarity in zip(left.tolist(), right.tolist(), column_scores[step].tolist()):
+                value1, value2 = values1[pair.column1][i], values2[pair.column2][j]
+                if value1 is not None and value2 is not None and fuzz.ratio(value1, value2) >= THRESHOLD:
+                    assert similarity == fuzz.ratio(value1, value2)
+
+    def test_no_candidates(self, tables):
+        values1, values2, plan, _, _ = tables
+        empty = np.array([], dtype=np.int64)
+        left, right, scores, column_scores = score_candidates(
+            values1, values2, empty, empty, plan, THRESHOLD, column_scores=True
+        )
+        assert len(left) == len(right) == len(scores) == 0
+        assert column_scores.shape == (len(plan.steps), 0)
+
+
+class TestTopK:
+    @pytest.mark.parametrize('k', [1, 3])
+    def test_keeps_the_k_best_pairs_per_row(self, tables, k):
+        values1, values2, plan, left, right = tables
+        reference = reference_scores(values1, values2, left, right, plan, THRESHOLD)
+        expected = {}
+        for i in sorted({i for i, _ in reference}):
+            ranked = sorted(((-score, j) for (row, j), score in reference.items() if row == i))
+            expected.update({(i, j): -score for score, j in ranked[:k]})
+
+        counters = ScoringCounters()
+        result_left, result_right, scores, _ = score_candidates(
+            values1, values2, left, right, plan, THRESHOLD, counters=counters, top_k=k
+        )
+        assert as_dict(result_left, result_right, scores) == expected
+        # Pairs come by left row, best first
+        order = np.lexsort((result_right, -scores, result_left))
+        assert order.tolist() == list(range(len(order)))
+
+    def test_does_not_depend_on_the_batch_size(self, tables):
+        values1, values2, plan, left, right = tables
+        expected = score_candidates(values1, values2, left, right, plan, THRESHOLD, top_k=2)
+        result = score_candidates(values1, values2, left[::-1], right[::-1], plan, THRESHOLD, top_k=2,
+                                  batch_size=50)
+        assert [array.tolist() for array in result[:3]] == [array.tolist() for array in expected[:3]]
+
+
+class TestPairScoreCache:
+    def test_lookup_after_store(self):
+        cache = _PairScoreCache()
+        cache.store(np.array([2, 5, 9]), np.array([90.0, 0.0, 100.0]))
+        scores, found = cache.lookup(np.array([5, 3, 9]))
+        assert found.tolist() == [True, False, True]
+        assert scores.tolist() == [0.0, 0.0, 100.0]
+
+    def test_evicts_the_least_recently_used(self):
+        cache = _PairScoreCache(capacity=2)
+        cache.lookup(np.array([1, 2]))
+        cache.store(np.array([1, 2]), np.array([10.0, 20.0]))
+        cache.lookup(np.array([2]))
+        cache.store(np.array([3]), np.array([30.0]))
+        _, found = cache.lookup(np.array([1, 2, 3]))
+        assert found.tolist() == [False, True, True]